@@ -1,20 +1,22 @@
 import asyncio
-import json
 import os
 import socket
-from datetime import datetime, timezone
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List
 
-import requests
-import yaml
+import httpx
+import orjson
 from fastapi import Body, FastAPI, HTTPException, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import Response
+from fastapi.responses import ORJSONResponse, Response
 from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
-from .config import get_devices, get_settings
+from .clock import now_iso
+from .config import cached_yaml, get_devices, get_settings
 from .features import FeatureStore
 from .mqtt_bus import Bus
 from .models.anomaly_vae import VAEAnomaly
@@ -25,7 +27,14 @@ from .policy.decisions import DecisionEngine
 from .policy.safety import Safety
 from .storage.db import DB
 
-app = FastAPI(title="hcai-mini")
+try:
+    import msgpack
+
+    HAS_MSGPACK = True
+except ImportError:  # pragma: no cover - optional dependency
+    HAS_MSGPACK = False
+
+app = FastAPI(title="hcai-mini", default_response_class=ORJSONResponse)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -50,6 +59,10 @@ explainer = Explainer()
 bus = Bus()
 engine = DecisionEngine(db, bus, feature_store, forecaster, anomaly, controller, safety)
 scheduler_task = None
+snapshot_task = None
+templates_task = None
+flush_task = None
+AUDIT_FLUSH_INTERVAL_S = 0.25
 
 if settings.ui_enable:
     app.mount("/ui", StaticFiles(directory="app/ui", html=True), name="ui")
@@ -61,24 +74,61 @@ SIMULATOR_URL = os.environ.get("SIMULATOR_URL", "http://localhost:9100")
 
 @app.on_event("startup")
 async def startup() -> None:
-    bus.start(engine.handle_message)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=8, thread_name_prefix="hcai-io")
+    )
+    app.state.sim_client = httpx.AsyncClient(
+        base_url=SIMULATOR_URL,
+        timeout=2.0,
+        limits=httpx.Limits(max_keepalive_connections=8),
+    )
+    bus.start(engine.mqtt_callbacks())
     async def discovery_scheduler():
         interval = max(1, settings.discovery_interval_hours) * 3600
         while True:
             await asyncio.sleep(interval)
             engine.start_discovery(settings.discovery_subnet, actor="scheduler")
-    global scheduler_task
+    async def audit_flusher():
+        # drains audit records left buffered after a burst
+        while True:
+            await asyncio.sleep(AUDIT_FLUSH_INTERVAL_S)
+            await asyncio.to_thread(engine.flush_audits)
+    global scheduler_task, snapshot_task, templates_task, templates_cache, flush_task
     scheduler_task = asyncio.create_task(discovery_scheduler())
+    flush_task = asyncio.create_task(audit_flusher())
+    snapshot_task = asyncio.create_task(_snapshot_loop())
+    templates_cache = await asyncio.to_thread(load_templates)
+    templates_task = asyncio.create_task(_template_refresh_loop())
+
+
+@app.on_event("shutdown")
+async def shutdown() -> None:
+    await app.state.sim_client.aclose()
+    engine.flush()
+
+
+RESPONSE_TTL_S = 1.0
+# endpoint -> (monotonic time built, serialized body) for responses that polling clients hit repeatedly
+_RESPONSE_CACHE: Dict[str, tuple[float, bytes]] = {}
+
+
+def _cached_json(key: str, build: Callable[[], Any]) -> Response:
+    now = time.monotonic()
+    hit = _RESPONSE_CACHE.get(key)
+    if hit is None or now - hit[0] >= RESPONSE_TTL_S:
+        hit = (now, orjson.dumps(build()))
+        _RESPONSE_CACHE[key] = hit
+    return Response(hit[1], media_type="application/json")
 
 
 @app.get("/health")
 def health() -> Dict[str, Any]:
-    return {"ok": True, "ts": datetime.now(timezone.utc).isoformat()}
+    return {"ok": True, "ts": now_iso()}
 
 
 @app.get("/tiles")
-def tiles() -> Dict[str, Any]:
-    return engine.latest_tiles
+def tiles() -> Response:
+    return _cached_json("tiles", lambda: engine.latest_tiles)
 
 
 @app.post("/discover/start")
@@ -86,44 +136,55 @@ def discover_start(payload: Dict[str, Any] = Body(default=None)) -> Dict[str, An
     subnet = payload.get("subnet") if payload else settings.discovery_subnet
     actor = payload.get("actor", "operator") if payload else "operator"
     engine.start_discovery(subnet, actor)
+    _RESPONSE_CACHE.clear()
     return {"status": "started", "subnet": subnet, "actor": actor}
 
 
 @app.get("/discover")
-def list_discoveries() -> Dict[str, Any]:
-    return engine.list_discoveries()
+def list_discoveries() -> Response:
+    return ORJSONResponse(engine.list_discoveries())
 
 
 @app.post("/discover/approve")
 def approve_device(device: Dict[str, Any]) -> Dict[str, Any]:
     result = engine.approve_device(device)
-    payload = {"device": device, "action": result, "ts": datetime.now(timezone.utc).isoformat()}
+    payload = {"device": device, "action": result, "ts": now_iso()}
     bus.publish("discover/approved", payload)
     return {"status": "approved", "device": device, "action": result}
 
 
+@app.post("/discover/approve_bulk")
+def approve_devices_bulk(payload: Dict[str, Any]) -> Dict[str, Any]:
+    devices = payload.get("devices")
+    if not isinstance(devices, list) or not devices:
+        raise HTTPException(status_code=400, detail="devices list required")
+    results = [engine.approve_device(device) for device in devices]
+    ts = now_iso()
+    bus.publish_batch(
+        [("discover/approved", {"device": device, "action": result, "ts": ts}) for device, result in zip(devices, results)]
+    )
+    return {"status": "approved", "count": len(devices), "actions": results}
+
+
 @app.get("/devices")
 def devices() -> Dict[str, Any]:
     return get_devices()
 
 
 @app.get("/devices/summary")
-def devices_summary() -> Dict[str, Any]:
+def devices_summary() -> Response:
     data = get_devices()
     devices = data.get("devices", [])
-    enriched = []
-    for device in devices:
-        rack = device.get("rack")
-        latest = db.latest_point(rack) if rack else None
-        enriched.append({**device, "latest": latest})
-    return {"devices": enriched}
+    points = db.latest_points([device["rack"] for device in devices if device.get("rack")])
+    enriched = [{**device, "latest": points.get(device.get("rack"))} for device in devices]
+    return ORJSONResponse({"devices": enriched})
 
 @app.delete("/devices/{device_id}")
 def delete_device(device_id: str) -> Dict[str, Any]:
     removed = engine.remove_device_entry(device_id)
     if not removed:
         raise HTTPException(status_code=404, detail="device not found")
-    payload = {"device_id": device_id, "ts": datetime.now(timezone.utc).isoformat()}
+    payload = {"device_id": device_id, "ts": now_iso()}
     bus.publish("discover/removed", payload)
     return {"status": "removed", "device_id": device_id}
 
@@ -134,17 +195,27 @@ def load_templates() -> List[Dict[str, Any]]:
     if not path.exists():
         return templates
     for file in path.glob("*.yaml"):
-        with file.open("r", encoding="utf-8") as handle:
-            item = yaml.safe_load(handle) or {}
-            if item:
-                item["file"] = file.name
-                templates.append(item)
+        item = cached_yaml(file)
+        if item:
+            templates.append({**item, "file": file.name})
     return templates
 
 
+TEMPLATE_REFRESH_S = 5.0
+templates_cache: List[Dict[str, Any]] = []
+
+
+async def _template_refresh_loop() -> None:
+    # rescans are cheap thanks to the mtime-keyed YAML cache, but still touch the disk, so run them in a thread
+    global templates_cache
+    while True:
+        await asyncio.sleep(TEMPLATE_REFRESH_S)
+        templates_cache = await asyncio.to_thread(load_templates)
+
+
 @app.get("/templates")
-def list_templates() -> Dict[str, Any]:
-    return {"templates": load_templates()}
+async def list_templates() -> Dict[str, Any]:
+    return {"templates": templates_cache}
 
 
 @app.post("/devices/validate")
@@ -161,34 +232,35 @@ def validate_device(device: Dict[str, Any]) -> Dict[str, Any]:
 
 
 @app.get("/actions")
-def actions(limit: int = 20) -> Dict[str, Any]:
+def actions(limit: int = 20) -> Response:
     rows = engine.get_recent_actions(limit)
     for row in rows:
+        # the raw cmd_json column stays in the response next to the parsed "cmd"; a malformed
+        # legacy row must not turn the whole response into invalid JSON, so it degrades to {}
         cmd = row.get("cmd_json")
         if isinstance(cmd, str):
             try:
-                row["cmd"] = json.loads(cmd)
-            except json.JSONDecodeError:
+                row["cmd"] = orjson.loads(cmd)
+            except orjson.JSONDecodeError:
                 row["cmd"] = {}
         else:
             row["cmd"] = cmd or {}
-    return {"actions": rows}
+    return Response(orjson.dumps({"actions": rows}), media_type="application/json")
 
 
 @app.get("/anomalies")
-def anomalies(limit: int = 20) -> Dict[str, Any]:
-    return {"anomalies": engine.get_recent_anomalies(limit)}
+def anomalies(limit: int = 20) -> Response:
+    return ORJSONResponse({"anomalies": engine.get_recent_anomalies(limit)})
 
 
 @app.get("/status")
-def status() -> Dict[str, Any]:
-    return engine.get_status()
+def status() -> Response:
+    return _cached_json("status", engine.get_status)
 
 
 @app.get("/mode")
-def get_mode() -> Dict[str, Any]:
-    state = engine.get_status()
-    return {"mode": state["mode"], "auto_enabled": state["auto_enabled"]}
+def get_mode() -> Response:
+    return _cached_json("mode", lambda: {"mode": engine.mode, "auto_enabled": engine.auto_enabled})
 
 
 @app.post("/mode")
@@ -199,6 +271,7 @@ def set_mode(payload: Dict[str, Any]) -> Dict[str, Any]:
         engine.set_mode(mode)
     if auto is not None:
         engine.set_auto(bool(auto))
+    _RESPONSE_CACHE.clear()
     return {"mode": engine.mode, "auto_enabled": engine.auto_enabled}
 
 
@@ -214,45 +287,38 @@ def approve_action(payload: Dict[str, Any]) -> Dict[str, Any]:
 
 
 @app.get("/telemetry/history")
-def telemetry_history(rack: str, limit: int = 120) -> Dict[str, Any]:
-    return {"rack": rack, "points": db.telemetry_history(rack, limit)}
+def telemetry_history(rack: str, limit: int = 120) -> Response:
+    return ORJSONResponse({"rack": rack, "points": db.telemetry_history(rack, limit)})
 
 
-def _simulator_request(method: str, path: str, data: Dict[str, Any] | None = None) -> Dict[str, Any]:
-    url = f"{SIMULATOR_URL}{path}"
+async def _simulator_request(method: str, path: str, data: Dict[str, Any] | None = None) -> Dict[str, Any]:
     try:
-        if method == "get":
-            resp = requests.get(url, timeout=2)
-        else:
-            resp = requests.post(url, json=data, timeout=2)
+        resp = await app.state.sim_client.request(method.upper(), path, json=data)
         resp.raise_for_status()
-        return resp.json()
-    except requests.RequestException as exc:
+        return orjson.loads(resp.content)
+    except (httpx.HTTPError, orjson.JSONDecodeError) as exc:
         raise HTTPException(status_code=503, detail=f"Simulator unavailable: {exc}") from exc
 
 
 @app.get("/simulator/scenarios")
-def simulator_scenarios() -> Dict[str, Any]:
-    return _simulator_request("get", "/scenarios")
+async def simulator_scenarios() -> Dict[str, Any]:
+    return await _simulator_request("get", "/scenarios")
 
 
 @app.post("/simulator/scenarios")
-def simulator_set(payload: Dict[str, Any]) -> Dict[str, Any]:
-    return _simulator_request("post", "/scenarios", payload)
+async def simulator_set(payload: Dict[str, Any]) -> Dict[str, Any]:
+    return await _simulator_request("post", "/scenarios", payload)
 
 
 @app.get("/simulator/devices")
-def simulator_devices() -> Dict[str, Any]:
-    return _simulator_request("get", "/devices")
+async def simulator_devices() -> Dict[str, Any]:
+    return await _simulator_request("get", "/devices")
 
 
-@app.post("/simulator/devices/import")
-def simulator_devices_import(payload: Dict[str, Any] | None = None) -> Dict[str, Any]:
-    data = _simulator_request("get", "/devices")
-    devices = data.get("devices", [])
+def _import_simulator_devices(devices: List[Dict[str, Any]], site_override: str | None) -> List[Dict[str, Any]]:
     imported: List[Dict[str, Any]] = []
-    site_override = (payload or {}).get("site")
-    ts = datetime.now(timezone.utc).isoformat()
+    events: List[tuple[str, Dict[str, Any]]] = []
+    ts = now_iso()
     for device in devices:
         entry = {
             "id": device.get("id") or f"sim_{device.get('rack', 'rack').lower()}",
@@ -265,9 +331,18 @@ def simulator_devices_import(payload: Dict[str, Any] | None = None) -> Dict[str,
             "description": "Imported from simulator",
         }
         action = engine.approve_device(entry)
-        payload_evt = {"device": entry, "action": action, "ts": ts}
-        bus.publish("discover/approved", payload_evt)
+        events.append(("discover/approved", {"device": entry, "action": action, "ts": ts}))
         imported.append({"id": entry["id"], "action": action})
+    bus.publish_batch(events)
+    return imported
+
+
+@app.post("/simulator/devices/import")
+async def simulator_devices_import(payload: Dict[str, Any] | None = None) -> Dict[str, Any]:
+    data = await _simulator_request("get", "/devices")
+    site_override = (payload or {}).get("site")
+    # approving rewrites devices.yaml and audits to SQLite, so keep it off the event loop
+    imported = await asyncio.to_thread(_import_simulator_devices, data.get("devices", []), site_override)
     return {"status": "ok", "imported": imported}
 
 
@@ -276,19 +351,66 @@ def metrics() -> Response:
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
+WS_MSGPACK_SUBPROTOCOL = "msgpack"
+# section -> (value, serialized json, digest); rebuilt once per tick and shared by every /ws client
+ws_sections: Dict[str, tuple[Any, bytes, int]] = {}
+ws_tick = asyncio.Event()
+ws_clients: "weakref.WeakSet[WebSocket]" = weakref.WeakSet()
+
+
+def _ws_snapshot() -> Dict[str, Any]:
+    return {
+        "tiles": engine.latest_tiles,
+        "discover": engine.list_discoveries(),
+        "actions": engine.get_recent_actions(5),
+        "anomalies": engine.get_recent_anomalies(5),
+        "status": engine.get_status(),
+    }
+
+
+def _build_ws_sections() -> Dict[str, tuple[Any, bytes, int]]:
+    sections = {}
+    for key, value in _ws_snapshot().items():
+        blob = orjson.dumps(value)
+        sections[key] = (value, blob, hash(blob))
+    return sections
+
+
+async def _snapshot_loop() -> None:
+    global ws_sections
+    while True:
+        if ws_clients:
+            # the snapshot reads SQLite under the DB lock, so keep it off the event loop
+            ws_sections = await asyncio.to_thread(_build_ws_sections)
+            ws_tick.set()
+            ws_tick.clear()
+        await asyncio.sleep(1)
+
+
 @app.websocket("/ws")
 async def websocket_endpoint(websocket: WebSocket) -> None:
-    await websocket.accept()
+    requested = websocket.headers.get("sec-websocket-protocol", "")
+    use_msgpack = HAS_MSGPACK and WS_MSGPACK_SUBPROTOCOL in [p.strip() for p in requested.split(",")]
+    await websocket.accept(subprotocol=WS_MSGPACK_SUBPROTOCOL if use_msgpack else None)
+    ws_clients.add(websocket)
+    # a slow client simply picks up the newest snapshot when it wakes, so missed ticks coalesce
+    last_sent: Dict[str, int] = {}
     try:
         while True:
-            payload = {
-                "tiles": engine.latest_tiles,
-                "discover": engine.list_discoveries(),
-                "actions": engine.get_recent_actions(5),
-                "anomalies": engine.get_recent_anomalies(5),
-                "status": engine.get_status(),
-            }
-            await websocket.send_json(payload)
-            await asyncio.sleep(1)
+            await ws_tick.wait()
+            frame = {key: section for key, section in ws_sections.items() if last_sent.get(key) != section[2]}
+            if not frame:
+                continue
+            for key, section in frame.items():
+                last_sent[key] = section[2]
+            if use_msgpack:
+                await websocket.send_bytes(
+                    msgpack.packb({key: value for key, (value, _, _) in frame.items()}, use_bin_type=True)
+                )
+            else:
+                body = orjson.dumps({key: orjson.Fragment(blob) for key, (_, blob, _) in frame.items()})
+                await websocket.send_text(body.decode())
     except WebSocketDisconnect:
         return
+    finally:
+        ws_clients.discard(websocket)
@@ -0,0 +1,36 @@
+import time
+from datetime import datetime, timezone
+
+# (epoch second, formatted string); swapped as one tuple so readers on other threads never see a torn pair
+_SECOND_CACHE: tuple[int, str] = (-1, "")
+
+
+def now_iso() -> str:
+    # UTC timestamp at one-second resolution, formatted at most once per second
+    global _SECOND_CACHE
+    second = int(time.time())
+    cached = _SECOND_CACHE
+    if cached[0] != second:
+        cached = (second, datetime.fromtimestamp(second, timezone.utc).isoformat())
+        _SECOND_CACHE = cached
+    return cached[1]
+
+
+# same idea for utc_iso: the "YYYY-MM-DDTHH:MM:SS" prefix of the last second formatted
+_PREFIX_CACHE: tuple[int, str] = (-1, "")
+
+
+def utc_iso(t: float) -> str:
+    # microsecond ISO-8601 with a Z suffix, built without a datetime object; strftime runs
+    # once per second, everything else is an f-string
+    global _PREFIX_CACHE
+    second = int(t)
+    cached = _PREFIX_CACHE
+    if cached[0] != second:
+        cached = (second, time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second)))
+        _PREFIX_CACHE = cached
+    return f"{cached[1]}.{int((t - second) * 1e6):06d}Z"
+
+
+def utc_now_iso() -> str:
+    return utc_iso(time.time())
@@ -1,3 +1,4 @@
+import copy
 import os
 from dataclasses import dataclass
 from functools import lru_cache
@@ -6,6 +7,11 @@ from typing import Any, Dict
 
 import yaml
 
+try:
+    from yaml import CSafeDumper as YamlDumper, CSafeLoader as YamlLoader
+except ImportError:  # pragma: no cover - PyYAML built without libyaml
+    from yaml import SafeDumper as YamlDumper, SafeLoader as YamlLoader
+
 
 @dataclass
 class Settings:
@@ -22,6 +28,7 @@ class Settings:
     discovery_timeout_s: int = int(os.environ.get("DISCOVERY_TIMEOUT_S", "180"))
     discovery_interval_hours: int = int(os.environ.get("DISCOVERY_INTERVAL_HOURS", "6"))
     template_dir: str = os.environ.get("DISCOVERY_TEMPLATE_DIR", "./config/templates")
+    act_rate_per_rack: float = float(os.environ.get("ACT_RATE_PER_RACK", "20"))
 
 
 @lru_cache
@@ -29,12 +36,29 @@ def get_settings() -> Settings:
     return Settings()
 
 
-def _load_yaml(path: str) -> Dict[str, Any]:
-    file_path = Path(path)
-    if not file_path.exists():
+_MISSING = object()
+_YAML_CACHE: Dict[str, tuple[tuple[int, int], Dict[str, Any]]] = {}
+
+
+def cached_yaml(path: Path) -> Dict[str, Any]:
+    # parsed documents are shared between callers; treat the result as read-only
+    key = str(path)
+    try:
+        stat = path.stat()
+    except FileNotFoundError:
+        _YAML_CACHE.pop(key, None)
         return {}
-    with file_path.open("r", encoding="utf-8") as handle:
-        return yaml.safe_load(handle) or {}
+    version = (stat.st_mtime_ns, stat.st_size)
+    cached = _YAML_CACHE.get(key)
+    if cached is None or cached[0] != version:
+        with path.open("r", encoding="utf-8") as handle:
+            cached = (version, yaml.load(handle, Loader=YamlLoader) or {})
+        _YAML_CACHE[key] = cached
+    return cached[1]
+
+
+def _load_yaml(path: str) -> Dict[str, Any]:
+    return copy.deepcopy(cached_yaml(Path(path)))
 
 
 def get_policy() -> Dict[str, Any]:
@@ -45,8 +69,19 @@ def get_devices() -> Dict[str, Any]:
     return _load_yaml(get_settings().devices_path)
 
 
+def _write_devices(devices: Dict[str, Any]) -> None:
+    path = Path(get_settings().devices_path)
+    text = yaml.dump(devices, Dumper=YamlDumper, sort_keys=False)
+    try:
+        if path.read_text(encoding="utf-8") == text:
+            return
+    except FileNotFoundError:
+        path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as handle:
+        handle.write(text)
+
+
 def append_device(entry: Dict[str, Any]) -> str:
-    settings = get_settings()
     devices = get_devices()
     devices_list = devices.get("devices", [])
 
@@ -54,50 +89,42 @@ def append_device(entry: Dict[str, Any]) -> str:
     if not entry.get("id"):
         entry["id"] = f"{entry.get('proto', 'dev')}_{entry.get('host', 'device')}"
 
-    action = "added"
-    replaced = False
-    for idx, existing in enumerate(devices_list):
-        if existing.get("id") == entry["id"]:
-            devices_list[idx] = entry
-            action = "updated"
-            replaced = True
-            break
-        if (
-            entry.get("host") == existing.get("host")
-            and entry.get("proto") == existing.get("proto")
-            and entry.get("port") == existing.get("port")
-        ):
-            devices_list[idx] = entry
-            action = "updated"
-            replaced = True
-            break
-
-    if not replaced:
-        devices_list.append(entry)
-
-    # Ensure there are no duplicate IDs after update
-    deduped = {}
+    # one pass builds both indexes; a later duplicate id overwrites the earlier value in place
+    by_id: Dict[Any, Dict[str, Any]] = {}
+    by_endpoint: Dict[tuple, Any] = {}
     for item in devices_list:
-        deduped[item.get("id")] = item
-    devices["devices"] = list(deduped.values())
+        by_id[item.get("id")] = item
+        by_endpoint.setdefault((item.get("host"), item.get("proto"), item.get("port")), item.get("id"))
+
+    # an id match wins over a host/proto/port match
+    if entry["id"] in by_id:
+        target = entry["id"]
+    else:
+        target = by_endpoint.get((entry.get("host"), entry.get("proto"), entry.get("port")), _MISSING)
+
+    if target is _MISSING:
+        action = "added"
+        by_id[entry["id"]] = entry
+    elif target == entry["id"]:
+        action = "updated"
+        by_id[target] = entry
+    else:
+        # same endpoint under a new id: swap the entry in at the old entry's position
+        action = "updated"
+        by_id = {(entry["id"] if key == target else key): (entry if key == target else item) for key, item in by_id.items()}
+
+    devices["devices"] = list(by_id.values())
     devices.setdefault("maps", {})
-    path = Path(settings.devices_path)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as handle:
-        yaml.safe_dump(devices, handle, sort_keys=False)
+    _write_devices(devices)
     return action
 
 
 def remove_device(device_id: str) -> bool:
-    settings = get_settings()
     devices = get_devices()
     devices_list = devices.get("devices", [])
     new_list = [item for item in devices_list if item.get("id") != device_id]
     if len(new_list) == len(devices_list):
         return False
     devices["devices"] = new_list
-    path = Path(settings.devices_path)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as handle:
-        yaml.safe_dump(devices, handle, sort_keys=False)
+    _write_devices(devices)
     return True
@@ -1,37 +1,91 @@
-from collections import defaultdict, deque
-from typing import Deque, Dict, List
+import threading
+from typing import Any, Dict, List
 
 import numpy as np
 
+# sensor readings carry far less precision than float32 offers; halves the memory per window
+WINDOW_DTYPE = np.float32
+
 
 class RollingWindow:
     def __init__(self, size: int = 120) -> None:
         self.size = size
-        self.buf: Deque[float] = deque(maxlen=size)
+        # fixed-size ring buffer; _idx is the next write slot, _count the number of valid samples
+        self._buf = np.zeros((size,), dtype=WINDOW_DTYPE)
+        self._idx = 0
+        self._count = 0
 
     def add(self, value: float) -> None:
-        self.buf.append(value)
-
-    def as_array(self) -> np.ndarray:
-        if not self.buf:
-            return np.zeros((self.size,), dtype=float)
-        arr = np.array(self.buf, dtype=float)
-        if arr.shape[0] < self.size:
-            pad = np.full((self.size - arr.shape[0],), arr[-1])
-            arr = np.concatenate([pad, arr])
+        self._buf[self._idx] = value
+        self._idx = (self._idx + 1) % self.size
+        if self._count < self.size:
+            self._count += 1
+
+    def as_array(self, out: np.ndarray | None = None) -> np.ndarray:
+        arr = np.empty((self.size,), dtype=WINDOW_DTYPE) if out is None else out
+        if not self._count:
+            arr[:] = 0.0
+        elif self._count == self.size:
+            tail = self.size - self._idx
+            arr[:tail] = self._buf[self._idx:]
+            arr[tail:] = self._buf[: self._idx]
+        else:
+            # partial window: samples live in _buf[:_count]; left-pad with the newest value
+            pad = self.size - self._count
+            arr[:pad] = self._buf[self._count - 1]
+            arr[pad:] = self._buf[: self._count]
         return arr
 
 
 class FeatureStore:
     def __init__(self, window: int = 120) -> None:
         self.window = window
-        self.buffers: Dict[str, Dict[str, RollingWindow]] = defaultdict(lambda: defaultdict(lambda: RollingWindow(window)))
+        self.buffers: Dict[str, Dict[str, RollingWindow]] = {}
+        # returned for unknown rack/metric pairs so reads never create buffers
+        self._zeros = np.zeros((window,), dtype=WINDOW_DTYPE)
+        self._zeros.flags.writeable = False
+        # per-thread (racks x window) matrix reused by get_windows
+        self._scratch = threading.local()
+
+    def register(self, rack: str, metric: str) -> RollingWindow:
+        rack_bufs = self.buffers.get(rack)
+        if rack_bufs is None:
+            rack_bufs = self.buffers[rack] = {}
+        buf = rack_bufs.get(metric)
+        if buf is None:
+            buf = rack_bufs[metric] = RollingWindow(self.window)
+        return buf
 
     def push(self, rack: str, metric: str, value: float) -> None:
-        self.buffers[rack][metric].add(value)
+        self.register(rack, metric).add(value)
 
     def get_window(self, rack: str, metric: str) -> np.ndarray:
-        return self.buffers[rack][metric].as_array()
+        buf = self.buffers.get(rack, {}).get(metric)
+        if buf is None:
+            return self._zeros
+        return buf.as_array()
+
+    def get_windows(self, racks: List[str], metric: str) -> np.ndarray:
+        # one row per rack, written into a scratch matrix owned by the calling thread; the result is
+        # only valid until that thread calls get_windows again, so copy anything that must outlive it
+        out = getattr(self._scratch, "buf", None)
+        if out is None or out.shape[0] < len(racks):
+            rows = 1 << max(0, len(racks) - 1).bit_length()
+            out = self._scratch.buf = np.empty((rows, self.window), dtype=WINDOW_DTYPE)
+        view = out[: len(racks)]
+        for row, rack in enumerate(racks):
+            buf = self.buffers.get(rack, {}).get(metric)
+            if buf is None:
+                view[row] = 0.0
+            else:
+                buf.as_array(out=view[row])
+        return view
 
-    def snapshot(self, rack: str) -> Dict[str, List[float]]:
-        return {metric: buf.as_array().tolist() for metric, buf in self.buffers[rack].items()}
+    def snapshot(self, rack: str) -> Dict[str, Any]:
+        # one (metrics x window) array instead of a Python float per sample; row i belongs to metrics[i].
+        # serialize with orjson.OPT_SERIALIZE_NUMPY to keep it out of Python lists entirely
+        bufs = self.buffers.get(rack, {})
+        values = np.empty((len(bufs), self.window), dtype=WINDOW_DTYPE)
+        for row, buf in enumerate(bufs.values()):
+            buf.as_array(out=values[row])
+        return {"metrics": list(bufs.keys()), "values": values}
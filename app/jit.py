@@ -0,0 +1,10 @@
+try:
+    from numba import njit
+
+    HAS_NUMBA = True
+except ImportError:  # pragma: no cover - optional dependency
+    HAS_NUMBA = False
+
+    def njit(*_args, **_kwargs):
+        # plain Python fallback: the decorated kernels are written to run fine uncompiled
+        return lambda fn: fn
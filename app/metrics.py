@@ -12,3 +12,24 @@ DISCOVER_DEVICES_APPROVED_TOTAL = Counter(
 DISCOVER_DURATION_SECONDS = Histogram(
     "discover_duration_seconds", "Duration of discovery scans in seconds"
 )
+ACTIONS_DROPPED_TOTAL = Counter(
+    "actions_dropped_total", "Actions dropped because the emission queue was full"
+)
+ACTIONS_FAILED_TOTAL = Counter(
+    "actions_failed_total", "Actions lost because storing or publishing them raised"
+)
+ACT_EVALUATIONS_FAILED_TOTAL = Counter(
+    "act_evaluations_failed_total", "Act-loop evaluation batches that raised; their pending racks were not evaluated"
+)
+ACTS_RATE_LIMITED_TOTAL = Counter(
+    "acts_rate_limited_total", "Telemetry messages recorded without a model evaluation due to the per-rack rate limit"
+)
+TELEMETRY_DROPPED_TOTAL = Counter(
+    "telemetry_dropped_total", "Telemetry messages dropped because the ingest queue was full"
+)
+TELEMETRY_FAILED_TOTAL = Counter(
+    "telemetry_failed_total", "Telemetry messages dropped because they could not be parsed or ingested"
+)
+DB_ROWS_DROPPED_TOTAL = Counter(
+    "db_rows_dropped_total", "Queued rows the DB writer dropped because SQLite rejected them", ["table"]
+)
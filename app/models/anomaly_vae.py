@@ -11,3 +11,12 @@ class VAEAnomaly:
         err = float((window_vec[-1] - window_vec.mean()) ** 2)
         score = 1.0 / (1.0 + err)
         return score, score >= self.threshold
+
+    def score_many(self, windows: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        # one score/alarm per row of a (racks x window) array
+        if windows.shape[1] == 0:
+            scores = np.zeros(windows.shape[0])
+            return scores, np.zeros(windows.shape[0], dtype=bool)
+        err = ((windows[:, -1] - windows.mean(axis=1)) ** 2).astype(np.float64)
+        scores = 1.0 / (1.0 + err)
+        return scores, scores >= self.threshold
@@ -6,15 +6,46 @@ import numpy as np
 class Forecaster:
     def __init__(self, horizon: int = 30) -> None:
         self.horizon = horizon
+        self._steps = np.arange(1, horizon + 1, dtype=np.float64)
 
-    def predict(self, series: np.ndarray) -> tuple[list[float], list[float], list[float]]:
+    def predict(self, series: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
         if series.size == 0:
             series = np.zeros(10)
         trend_window = min(10, series.size - 1) if series.size > 1 else 1
         trend = 0.0
         if trend_window > 0:
             trend = (series[-1] - series[-trend_window - 1]) / trend_window if series.size > trend_window + 1 else 0.0
-        preds = [float(series[-1] + (i + 1) * trend * 0.5) for i in range(self.horizon)]
-        lo = [p - 0.8 for p in preds]
-        hi = [p + 0.8 for p in preds]
-        return preds, lo, hi
+        # stays in ndarray land; convert at the JSON boundary, not here
+        preds = series[-1] + self._steps * trend * 0.5
+        return preds, preds - 0.8, preds + 0.8
+
+    def predict_many(self, windows: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # (racks x window) in, (racks x horizon) out; row-for-row identical to predict()
+        if windows.shape[1] == 0:
+            windows = np.zeros((windows.shape[0], 10))
+        size = windows.shape[1]
+        trend_window = min(10, size - 1) if size > 1 else 1
+        last = windows[:, -1]
+        if trend_window > 0 and size > trend_window + 1:
+            trend = (last - windows[:, -trend_window - 1]) / trend_window
+        else:
+            trend = np.zeros_like(last)
+        preds = last[:, None] + self._steps[None, :] * (trend * 0.5)[:, None]
+        return preds, preds - 0.8, preds + 0.8
+
+    def predict_into(self, windows: np.ndarray, out_pred: np.ndarray, out_lo: np.ndarray, out_hi: np.ndarray) -> None:
+        # predict_many() written into caller-owned (racks x horizon) buffers, no temporaries per call
+        if windows.shape[1] == 0:
+            out_pred[...] = 0.0
+        else:
+            size = windows.shape[1]
+            trend_window = min(10, size - 1) if size > 1 else 1
+            last = windows[:, -1:]
+            if trend_window > 0 and size > trend_window + 1:
+                np.multiply(last - windows[:, -trend_window - 1 : -trend_window], 0.5 / trend_window, out=out_lo[:, :1])
+                np.multiply(self._steps, out_lo[:, :1], out=out_pred)
+                np.add(out_pred, last, out=out_pred)
+            else:
+                out_pred[...] = last
+        np.subtract(out_pred, 0.8, out=out_lo)
+        np.add(out_pred, 0.8, out=out_hi)
@@ -1,4 +1,6 @@
-from typing import Dict
+from typing import Dict, Sequence
+
+import numpy as np
 
 
 def clamp(value: float, lo: float, hi: float) -> float:
@@ -6,18 +8,35 @@ def clamp(value: float, lo: float, hi: float) -> float:
 
 
 class MPCController:
+    target_c = 23.0
+
     def __init__(self, limits: Dict[str, Dict[str, float]], weights: Dict[str, float]) -> None:
         self.limits = limits
         self.weights = weights
+        self._fan_min = float(limits["fan_rpm"]["min"])
+        self._fan_max = float(limits["fan_rpm"]["max"])
+        self._temp_min = float(limits["temp_c"]["min"])
+        self._temp_max = float(limits["temp_c"]["max"])
 
-    def propose(self, forecast_temp: list[float], current_set: Dict[str, float]) -> Dict[str, float]:
-        target = 23.0
-        lookahead = min(5, len(forecast_temp) - 1) if forecast_temp else 0
-        error = forecast_temp[lookahead] - target if forecast_temp else 0.0
+    def propose(self, forecast_temp: Sequence[float], current_set: Dict[str, float]) -> Dict[str, float]:
+        horizon = len(forecast_temp)
+        lookahead = min(5, horizon - 1) if horizon else 0
+        error = forecast_temp[lookahead] - self.target_c if horizon else 0.0
         fan = current_set.get("fan_rpm", 1200)
         supply = current_set.get("supply_temp_c", 18.0)
-        delta_fan = 150 if error > 0 else -100
-        delta_temp = -0.3 if error > 0 else 0.2
-        new_fan = clamp(fan + delta_fan, self.limits["fan_rpm"]["min"], self.limits["fan_rpm"]["max"])
-        new_supply = clamp(supply + delta_temp, self.limits["temp_c"]["min"], self.limits["temp_c"]["max"])
+        if error > 0:
+            fan, supply = fan + 150, supply - 0.3
+        else:
+            fan, supply = fan - 100, supply + 0.2
+        lo, hi = self._fan_min, self._fan_max
+        new_fan = lo if fan < lo else (hi if fan > hi else fan)
+        lo, hi = self._temp_min, self._temp_max
+        new_supply = lo if supply < lo else (hi if supply > hi else supply)
         return {"supply_temp_c": round(new_supply, 1), "fan_rpm": int(new_fan)}
+
+    def propose_many(self, temp_at_look: np.ndarray, fan: np.ndarray, supply: np.ndarray) -> Dict[str, np.ndarray]:
+        # one row per rack; temp_at_look is each rack's forecast at the lookahead step
+        hot = (temp_at_look - self.target_c) > 0
+        new_fan = np.clip(fan + np.where(hot, 150, -100), self._fan_min, self._fan_max)
+        new_supply = np.clip(supply + np.where(hot, -0.3, 0.2), self._temp_min, self._temp_max)
+        return {"supply_temp_c": np.round(new_supply, 1), "fan_rpm": new_fan.astype(np.int64)}
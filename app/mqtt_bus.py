@@ -1,16 +1,23 @@
-import json
 import threading
-from typing import Callable
+from typing import Any, Callable, Dict, Iterable, List, Tuple
 
+import orjson
 from paho.mqtt import client as mqtt
 
 from .config import get_settings
 
 
+# publishes to one topic within this window go out as a single {"batch": [...]} message
+BATCH_WINDOW_S = 0.005
+
+
 class Bus:
     def __init__(self) -> None:
         self.settings = get_settings()
         self.client = mqtt.Client()
+        self._buf: Dict[str, List[Any]] = {}
+        self._buf_lock = threading.Lock()
+        self._flush_timer: threading.Timer | None = None
         if self.settings.mqtt_user:
             self.client.username_pw_set(self.settings.mqtt_user, self.settings.mqtt_pass)
         self.host, self.port = self._parse_url(self.settings.mqtt_url)
@@ -23,17 +30,50 @@ class Bus:
             return host, int(port)
         return host, 1883
 
-    def start(self, on_message: Callable) -> None:
-        self.client.on_message = on_message
+    def start(self, callbacks: Iterable[Tuple[str, Callable]]) -> None:
+        # one paho callback per subscription; anything else that arrives is ignored
+        self.client.on_message = lambda *_: None
+        subscriptions = []
+        for topic_filter, callback in callbacks:
+            self.client.message_callback_add(topic_filter, callback)
+            subscriptions.append((topic_filter, 1))
+        # allow back-to-back QoS 1 publishes to pipeline instead of stalling on PUBACKs
+        self.client.max_inflight_messages_set(200)
+        self.client.max_queued_messages_set(0)
         self.client.connect(self.host, self.port, 60)
-        self.client.subscribe("site/+/rack/+/telemetry", qos=1)
-        self.client.subscribe("device/+/status", qos=1)
-        self.client.subscribe("ctrl/+/receipt", qos=1)
-        self.client.subscribe("discover/#", qos=1)
+        self.client.subscribe(subscriptions)
         threading.Thread(target=self.client.loop_forever, daemon=True).start()
 
-    def publish(self, topic: str, payload: dict, qos: int = 1, retain: bool = False) -> None:
-        self.client.publish(topic, json.dumps(payload), qos=qos, retain=retain)
+    def publish(self, topic: str, payload: dict | bytes, qos: int = 1, retain: bool = False) -> None:
+        # callers that also store the JSON can pass pre-encoded bytes and skip a second encode
+        data = payload if isinstance(payload, bytes) else orjson.dumps(payload)
+        self.client.publish(topic, data, qos=qos, retain=retain)
+
+    def publish_batch(self, items: Iterable[Tuple[str, Dict[str, Any]]], qos: int = 1, retain: bool = False) -> None:
+        # queue everything before the network loop gets a chance to flush, so paho packs the
+        # PUBLISH packets into as few writes as possible
+        for topic, payload in items:
+            self.client.publish(topic, orjson.dumps(payload), qos=qos, retain=retain)
+
+    def publish_batched(self, topic: str, payload: dict | bytes) -> None:
+        with self._buf_lock:
+            self._buf.setdefault(topic, []).append(payload)
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(BATCH_WINDOW_S, self.flush_batched)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
+
+    def flush_batched(self) -> None:
+        with self._buf_lock:
+            buf, self._buf = self._buf, {}
+            self._flush_timer = None
+        for topic, items in buf.items():
+            if len(items) == 1:
+                # a lone message keeps the plain single-object shape
+                self.publish(topic, items[0])
+                continue
+            batch = [orjson.Fragment(item) if isinstance(item, bytes) else item for item in items]
+            self.client.publish(topic, orjson.dumps({"batch": batch}), qos=1)
 
     def publish_text(self, topic: str, payload: str, qos: int = 1, retain: bool = False) -> None:
         self.client.publish(topic, payload, qos=qos, retain=retain)
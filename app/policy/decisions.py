@@ -1,25 +1,104 @@
-import json
-from datetime import datetime, timedelta, timezone
+import hashlib
+import logging
+import math
+import queue
+import threading
+import time
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List
 
+import numpy as np
+import orjson
+
+from ..clock import utc_now_iso
 from ..config import append_device, get_devices, get_policy, get_settings, remove_device
 from ..features import FeatureStore
+from ..jit import njit
 from ..metrics import (
+    ACT_EVALUATIONS_FAILED_TOTAL,
+    ACTIONS_DROPPED_TOTAL,
+    ACTIONS_FAILED_TOTAL,
+    ACTS_RATE_LIMITED_TOTAL,
     DISCOVER_DEVICES_APPROVED_TOTAL,
     DISCOVER_DEVICES_FOUND_TOTAL,
     DISCOVER_DURATION_SECONDS,
     DISCOVER_SCANS_TOTAL,
+    TELEMETRY_DROPPED_TOTAL,
+    TELEMETRY_FAILED_TOTAL,
 )
 from ..models.anomaly_vae import VAEAnomaly
 from ..models.forecaster import Forecaster
 from ..models.mpc import MPCController
 from ..policy.safety import Safety
-from ..storage.db import DB
-from ..storage.audit import record_audit
+from ..storage.db import DB, pack_raw
+from ..storage.audit import audit_row
+
+
+# discovery payloads above this size are parsed and handled off the MQTT network thread
+LARGE_PAYLOAD_BYTES = 65_536
+INGEST_LANES = 4
+INGEST_QUEUE_MAX = 2048
+CTRL_TOPIC_CACHE_MAX = 1024
+
+logger = logging.getLogger(__name__)
+
+_NAN = float("nan")
+# bit -> trigger name, in the order the names appear in explanations
+_TRIGGER_BITS = (
+    (1 << 0, "vae"),
+    (1 << 1, "temp_limit"),
+    (1 << 2, "forecast"),
+    (1 << 3, "temp_trend"),
+    (1 << 4, "power_spike"),
+    (1 << 5, "humidity"),
+)
+
+
+@njit(cache=True)
+def _evaluate_triggers(
+    window: np.ndarray,
+    preds: np.ndarray,
+    alarm: bool,
+    current_temp: float,
+    power_kw: float,
+    hum: float,
+    temp_max: float,
+    power_alarm: float,
+    hum_min: float,
+    hum_max: float,
+) -> int:
+    # missing readings arrive as NaN, and every comparison against NaN is false
+    mask = 0
+    if alarm:
+        mask |= 1 << 0
+    if current_temp >= temp_max:
+        mask |= 1 << 1
+    if preds.size:
+        target = preds[5] if preds.size > 5 else preds[0]
+        if target >= temp_max:
+            mask |= 1 << 2
+    if window.size >= 6 and (window[-1] - window[-6]) >= 0.8:
+        mask |= 1 << 3
+    if power_kw >= power_alarm:
+        mask |= 1 << 4
+    if hum < hum_min or hum > hum_max:
+        mask |= 1 << 5
+    return mask
 
 
 class DecisionEngine:
+    # first matching trigger names the action; anything else is a forecast-only trigger
+    _REASON_PRIORITY = (
+        ("temp_limit", "temperature_limit"),
+        ("temp_trend", "temperature_trend"),
+        ("power_spike", "power_spike"),
+        ("humidity", "humidity_out_of_range"),
+        ("vae", "anomaly"),
+    )
+
     def __init__(
         self,
         db: DB,
@@ -38,6 +117,7 @@ class DecisionEngine:
         self.controller = controller
         self.safety = safety
         self.policy = get_policy()
+        self._refresh_policy_cache()
         self.settings = get_settings()
         self.mode = self.settings.mode
         self.latest_tiles: Dict[str, Dict[str, Any]] = {}
@@ -48,218 +128,477 @@ class DecisionEngine:
             "started_at": None,
             "error": None,
         }
-        self.discovery_deadline: datetime | None = None
+        # time.monotonic() deadline for the running scan
+        self.discovery_deadline: float | None = None
         self.discovery_timeout = self.settings.discovery_timeout_s
-        self.discovery_history: List[Dict[str, Any]] = []
+        self.discovery_history: deque[Dict[str, Any]] = deque(maxlen=50)
         self.ingest_count = 0
+        self._ingest_stat_lock = threading.Lock()
         self.last_ingest_ts: str | None = None
         self.started_at = datetime.now(timezone.utc)
         self.auto_enabled = True
         self.dynamic_devices: Dict[str, str] = {}
         self.devices_path = Path(self.settings.devices_path)
         self.devices_mtime = 0.0
+        self._devices_stat_interval = 2.0
+        self._devices_stat_deadline = 0.0
         self.rack_device_map: Dict[str, str] = {}
         self.device_site_map: Dict[str, str] = {}
         self._reload_devices()
+        self._parse_pool = ThreadPoolExecutor(max_workers=2, thread_name_prefix="hcai-json")
+        self._ctrl_topic_cache: Dict[str, str] = {}
+        # key order matches the published payload; copied per action
+        self._action_tpl: Dict[str, Any] = {
+            "ts": None,
+            "device_id": None,
+            "cmd": "setpoints",
+            "set": None,
+            "mode": None,
+            "reason": None,
+            "ticket": "HCAI-BOOTSTRAP",
+            "constraints": None,
+            "safety_summary": None,
+            "explain": None,
+        }
+        self._act_every = 5
+        self._act_margin_c = 2.0
+        self._msg_count_per_rack: Dict[str, int] = defaultdict(int)
+        # per-rack token bucket in front of the models: rack -> [tokens, last refill (monotonic)];
+        # a flooding publisher still gets its telemetry stored, just not evaluated faster than this
+        self._act_rate = self.settings.act_rate_per_rack
+        self._act_burst = max(1.0, self._act_rate)
+        self._act_buckets: Dict[str, List[float]] = {}
+        self._act_interval_s = 0.05
+        self._act_pending: Dict[str, tuple[Dict[str, Any], str]] = {}
+        self._act_lock = threading.Lock()
+        self._feature_lock = threading.Lock()
+        # rack -> (window digest, preds/lo/hi rows, score, alarm); keyed on content, so a push invalidates it.
+        # the rows array is owned by the entry and overwritten in place on the next miss
+        self._model_memo: Dict[str, tuple[bytes, np.ndarray, float, bool]] = {}
+        # (preds/lo/hi x racks x horizon) output of the batched forecaster call
+        self._pred_buf = np.empty((3, 0, forecaster.horizon), np.float32)
+        # the act thread and flush() both evaluate; _pred_buf and _model_memo are not safe to share
+        self._eval_lock = threading.Lock()
+        self._act_failing = False
+        self._action_q: "queue.Queue[tuple[Dict[str, Any], str, bool]]" = queue.Queue(maxsize=1024)
+        # telemetry leaves the paho thread right away; lanes are sharded by topic so one rack's
+        # samples stay in order, and a full lane drops instead of backing up the broker connection
+        # items are (parsed message, None) from batches or (None, raw bytes) from per-rack topics
+        self._ingest_lanes: List["queue.Queue[tuple[Dict[str, Any] | None, bytes | None]]"] = [
+            queue.Queue(maxsize=INGEST_QUEUE_MAX) for _ in range(INGEST_LANES)
+        ]
+        self._audit_buffer: List[Dict[str, Any]] = []
+        self._audit_lock = threading.Lock()
+        self._audit_last_flush = 0.0
+        # workers start last, once every queue, buffer and lock they touch exists
+        threading.Thread(target=self._act_loop, name="hcai-act", daemon=True).start()
+        threading.Thread(target=self._action_worker, name="hcai-actions", daemon=True).start()
+        for lane, lane_q in enumerate(self._ingest_lanes):
+            threading.Thread(target=self._ingest_worker, args=(lane_q,), name=f"hcai-ingest-{lane}", daemon=True).start()
 
-    def handle_message(self, _client, _userdata, msg) -> None:
-        topic = msg.topic
-        payload = msg.payload.decode()
-        if topic.startswith("site/"):
-            data = json.loads(payload)
-            self._handle_telemetry(data)
-        elif topic.startswith("ctrl/") and topic.endswith("/receipt"):
-            data = json.loads(payload)
-            self.db.record_receipt({
-                "ts": data.get("ts"),
-                "device_id": data.get("device_id"),
-                "status": data.get("status"),
-                "applied_json": json.dumps(data.get("applied", {})),
-                "latency_ms": data.get("latency_ms"),
-                "notes": data.get("notes"),
-            })
-        elif topic == "discover/raw":
-            data = json.loads(payload)
-            raw_entries = data.get("raw", [])
-            self.discovery_history.append({"ts": data.get("ts"), "raw_count": len(raw_entries)})
-            self.discovery_history = self.discovery_history[-50:]
-        elif topic == "discover/results":
-            data = json.loads(payload)
-            self.discovery_results = data.get("devices", [])
-            count = len(self.discovery_results)
-            duration = data.get("duration_s")
-            DISCOVER_DEVICES_FOUND_TOTAL.inc(count)
-            if duration:
-                DISCOVER_DURATION_SECONDS.observe(duration)
-            self.discovery_state = {
-                "status": "done",
-                "message": f"Found {count} device(s)" if count else "No devices discovered",
-                "started_at": self.discovery_state.get("started_at"),
-                "completed_at": datetime.now(timezone.utc).isoformat(),
-                "error": None,
-            }
-            record_audit(self.db, "system", "discover_results", data)
-            self.discovery_deadline = None
-        elif topic in {"discover/approved", "discover/removed"}:
-            self._reload_devices()
-        else:
-            # ignore
-            pass
+    def mqtt_callbacks(self) -> List[tuple[str, Callable[[Any, Any, Any], None]]]:
+        # (subscription, paho callback); paho's topic matcher does the dispatch, no branching here
+        def direct(handler):
+            return lambda _client, _userdata, msg: handler(msg.topic, msg.payload)
+
+        def offloaded(handler):
+            # discovery results just swap engine state, so ordering against telemetry doesn't matter
+            def callback(_client, _userdata, msg) -> None:
+                if len(msg.payload) > LARGE_PAYLOAD_BYTES:
+                    self._parse_pool.submit(handler, msg.topic, msg.payload)
+                else:
+                    handler(msg.topic, msg.payload)
+
+            return callback
+
+        return [
+            ("site/+/rack/+/telemetry", direct(self._on_site)),
+            ("site/+/telemetry/batch", direct(self._on_site_batch)),
+            ("ctrl/+/receipt", direct(self._on_ctrl_receipt)),
+            ("discover/raw", offloaded(self._on_discover_raw)),
+            ("discover/results", offloaded(self._on_discover_results)),
+            ("discover/approved", direct(self._reload_devices_msg)),
+            ("discover/removed", direct(self._reload_devices_msg)),
+        ]
+
+    def _on_site(self, topic: str, payload: bytes) -> None:
+        self._enqueue_telemetry(topic, None, payload)
 
-    def _handle_telemetry(self, data: Dict[str, Any]) -> None:
+    def _on_site_batch(self, _topic: str, payload: bytes) -> None:
+        # {"site": ..., "racks": [<per-rack telemetry message>, ...]} from a batching edge bridge;
+        # each rack goes to the lane its own topic hashes to, so ordering matches per-rack publishes
+        # runs on the MQTT network thread, so a malformed batch is counted here instead of raising
+        try:
+            batch = orjson.loads(payload)
+            site = batch.get("site")
+            items = list(batch.get("racks", []))
+        except Exception:
+            TELEMETRY_FAILED_TOTAL.inc()
+            logger.warning("telemetry batch could not be parsed (%d bytes)", len(payload))
+            return
+        for item in items:
+            if not isinstance(item, dict):
+                TELEMETRY_FAILED_TOTAL.inc()
+                continue
+            rack_topic = f"site/{item.get('site', site)}/rack/{item.get('rack', 'unknown')}/telemetry"
+            self._enqueue_telemetry(rack_topic, item, None)
+
+    def _enqueue_telemetry(self, topic: str, data: Dict[str, Any] | None, raw: bytes | None) -> None:
+        try:
+            self._ingest_lanes[hash(topic) % INGEST_LANES].put_nowait((data, raw))
+        except queue.Full:
+            TELEMETRY_DROPPED_TOTAL.inc()
+
+    def _ingest_worker(self, lane_q: "queue.Queue[tuple[Dict[str, Any] | None, bytes | None]]") -> None:
+        failing = False
+        while True:
+            data, raw = lane_q.get()
+            try:
+                self._handle_telemetry(orjson.loads(raw) if data is None else data, raw)
+            except Exception:  # one malformed message must not stop the lane
+                TELEMETRY_FAILED_TOTAL.inc()
+                # one traceback per failure streak on this lane; the counter carries the rate
+                if not failing:
+                    logger.exception("telemetry message could not be ingested")
+                failing = True
+            else:
+                failing = False
+            finally:
+                lane_q.task_done()
+
+    def _on_ctrl_receipt(self, _topic: str, payload: bytes) -> None:
+        data = orjson.loads(payload)
+        self.db.record_receipt(
+            data.get("ts"),
+            data.get("device_id"),
+            data.get("status"),
+            orjson.dumps(data.get("applied", {})).decode(),
+            data.get("latency_ms"),
+            data.get("notes"),
+        )
+
+    def _on_discover_raw(self, _topic: str, payload: bytes) -> None:
+        data = orjson.loads(payload)
+        raw_entries = data.get("raw", [])
+        self.discovery_history.append({"ts": data.get("ts"), "raw_count": len(raw_entries)})
+
+    def _on_discover_results(self, _topic: str, payload: bytes) -> None:
+        data = orjson.loads(payload)
+        self.discovery_results = data.get("devices", [])
+        count = len(self.discovery_results)
+        duration = data.get("duration_s")
+        DISCOVER_DEVICES_FOUND_TOTAL.inc(count)
+        if duration:
+            DISCOVER_DURATION_SECONDS.observe(duration)
+        self.discovery_state = {
+            "status": "done",
+            "message": f"Found {count} device(s)" if count else "No devices discovered",
+            "started_at": self.discovery_state.get("started_at"),
+            "completed_at": utc_now_iso(),
+            "error": None,
+        }
+        self._queue_audit("system", "discover_results", data)
+        self.discovery_deadline = None
+
+    def _reload_devices_msg(self, _topic: str, _payload: bytes) -> None:
+        self._reload_devices()
+
+    def _handle_telemetry(self, data: Dict[str, Any], raw: bytes | None = None) -> None:
         rack = data.get("rack", "unknown")
+        # one timestamp per message, shared by the fallback ts and every row _maybe_act writes
+        now_ts = utc_now_iso()
+        ts = data.get("ts") or now_ts
         metrics = data.get("metrics", {})
         device_id = data.get("device_id")
         if device_id and rack:
-            self.dynamic_devices[rack] = device_id
+            existing = self.dynamic_devices.get(rack)
+            if existing is not device_id and existing != device_id:
+                self.dynamic_devices[rack] = device_id
         temp = metrics.get("temp_c")
         if temp is not None:
-            self.feature_store.push(rack, "temp_c", temp)
-        self.db.insert(
-            "telemetry",
-            {
-                "ts": data.get("ts"),
-                "site": data.get("site"),
-                "rack": rack,
-                "temp_c": temp,
-                "hum_pct": metrics.get("hum_pct"),
-                "power_kw": metrics.get("power_kw"),
-                "airflow_cfm": metrics.get("airflow_cfm"),
-                "raw_json": json.dumps(data),
-            },
+            with self._feature_lock:
+                self.feature_store.push(rack, "temp_c", temp)
+        self.db.insert_telemetry(
+            ts,
+            data.get("site"),
+            rack,
+            temp,
+            metrics.get("hum_pct"),
+            metrics.get("power_kw"),
+            metrics.get("airflow_cfm"),
+            # the received bytes already are the JSON text; compressed, not re-encoded
+            pack_raw(raw if raw is not None else orjson.dumps(data)),
         )
-        ts = data.get("ts")
-        self.latest_tiles[rack] = {
-            "ts": ts,
-            "metrics": metrics,
-        }
-        self._maybe_act(rack, metrics)
-        self.ingest_count += 1
-        self.last_ingest_ts = ts
-
-    def _maybe_act(self, rack: str, metrics: Dict[str, Any]) -> None:
-        window = self.feature_store.get_window(rack, "temp_c")
-        preds, lo, hi = self.forecaster.predict(window)
-        score, alarm = self.anomaly.score(window)
-        self.db.insert(
-            "forecasts",
-            {
-                "ts": datetime.now(timezone.utc).isoformat(),
-                "horizon_s": 60,
-                "rack": rack,
-                "temp_pred": preds[0] if preds else None,
-                "temp_lo": lo[0] if lo else None,
-                "temp_hi": hi[0] if hi else None,
-                "power_pred": None,
-            },
+        tile = self.latest_tiles.get(rack)
+        if tile is None or tile["ts"] != ts:
+            self.latest_tiles[rack] = {
+                "ts": ts,
+                "metrics": metrics,
+            }
+        if self._should_act(rack, metrics):
+            if self._take_act_token(rack):
+                self._maybe_act(rack, metrics, now_ts)
+            else:
+                ACTS_RATE_LIMITED_TOTAL.inc()
+        with self._ingest_stat_lock:
+            self.ingest_count += 1
+            self.last_ingest_ts = ts
+
+    def _should_act(self, rack: str, metrics: Dict[str, Any]) -> bool:
+        # cool, in-band racks only run the models every _act_every messages; anything near a
+        # rule-based trigger runs them every time
+        count = self._msg_count_per_rack[rack] + 1
+        self._msg_count_per_rack[rack] = count
+        temp = metrics.get("temp_c")
+        power_kw = metrics.get("power_kw")
+        hum = metrics.get("hum_pct")
+        hot = (
+            (temp is not None and temp >= self._temp_max - self._act_margin_c)
+            or (power_kw is not None and power_kw >= self._power_alarm)
+            or (hum is not None and (hum < self._hum_min or hum > self._hum_max))
         )
-        self.db.insert(
-            "anomalies",
-            {
-                "ts": datetime.now(timezone.utc).isoformat(),
-                "rack": rack,
-                "score": score,
-                "threshold": self.anomaly.threshold,
-                "is_alarm": 1 if alarm else 0,
-            },
+        return hot or count % self._act_every == 0
+
+    def _take_act_token(self, rack: str) -> bool:
+        if self._act_rate <= 0:
+            return True
+        now = time.monotonic()
+        bucket = self._act_buckets.get(rack)
+        if bucket is None:
+            bucket = self._act_buckets[rack] = [self._act_burst, now]
+        else:
+            bucket[0] = min(self._act_burst, bucket[0] + (now - bucket[1]) * self._act_rate)
+            bucket[1] = now
+        if bucket[0] < 1.0:
+            return False
+        bucket[0] -= 1.0
+        return True
+
+    def flush(self) -> None:
+        for lane_q in self._ingest_lanes:
+            lane_q.join()
+        self.run_pending_acts()
+        # actions queued by that evaluation (or earlier) are stored and published before returning
+        self._action_q.join()
+        self.bus.flush_batched()
+        self.flush_audits()
+        self.db.flush()
+
+    def _queue_audit(self, actor: str, action: str, payload: Dict[str, Any]) -> None:
+        # audits after a quiet spell go straight out; bursts (discovery, bulk approvals) coalesce
+        with self._audit_lock:
+            self._audit_buffer.append(audit_row(actor, action, payload))
+            due = len(self._audit_buffer) >= 32 or time.monotonic() - self._audit_last_flush >= 0.25
+        if due:
+            self.flush_audits()
+
+    def flush_audits(self) -> None:
+        with self._audit_lock:
+            rows, self._audit_buffer = self._audit_buffer, []
+            self._audit_last_flush = time.monotonic()
+        if rows:
+            self.db.record_audit_batch(rows)
+
+    def _maybe_act(self, rack: str, metrics: Dict[str, Any], now_ts: str) -> None:
+        # evaluated by the act loop; a rack seen twice within one interval keeps only its latest sample
+        with self._act_lock:
+            self._act_pending[rack] = (metrics, now_ts)
+
+    def _act_loop(self) -> None:
+        while True:
+            time.sleep(self._act_interval_s)
+            try:
+                self.run_pending_acts()
+            except Exception:  # a bad batch must not stop future evaluations
+                ACT_EVALUATIONS_FAILED_TOTAL.inc()
+                # one traceback per failure streak; the counter shows whether it persists
+                if not self._act_failing:
+                    logger.exception("act loop evaluation failed")
+                self._act_failing = True
+            else:
+                self._act_failing = False
+
+    def run_pending_acts(self) -> None:
+        with self._eval_lock:
+            self._run_pending_acts()
+
+    def _run_pending_acts(self) -> None:
+        with self._act_lock:
+            if not self._act_pending:
+                return
+            pending, self._act_pending = self._act_pending, {}
+        racks = list(pending)
+        with self._feature_lock:
+            windows = self.feature_store.get_windows(racks, "temp_c")
+        digests = [hashlib.blake2b(windows[i].tobytes(), digest_size=8).digest() for i in range(len(racks))]
+        # racks whose window bytes are unchanged since their last evaluation reuse the model outputs
+        misses = [i for i, rack in enumerate(racks) if self._model_memo.get(rack, (None,))[0] != digests[i]]
+        if misses:
+            bands, scores, alarms = self._score(windows[misses])
+            for j, i in enumerate(misses):
+                entry = self._model_memo.get(racks[i])
+                rack_bands = entry[1] if entry is not None else np.empty((3, self.forecaster.horizon), np.float32)
+                rack_bands[...] = bands[:, j]
+                self._model_memo[racks[i]] = (digests[i], rack_bands, float(scores[j]), bool(alarms[j]))
+        for i, rack in enumerate(racks):
+            metrics, now_ts = pending[rack]
+            _, (preds, lo, hi), score, alarm = self._model_memo[rack]
+            self._act_on(rack, metrics, now_ts, windows[i], preds, lo, hi, score, alarm)
+
+    def _score(self, windows: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        # pure model path for a (racks x window) batch: both models, one shared input, no policy
+        # branching; bands is a view of the reused float32 buffer, valid until the next call
+        if self._pred_buf.shape[1] < len(windows):
+            self._pred_buf = np.empty((3, 1 << (len(windows) - 1).bit_length(), self.forecaster.horizon), np.float32)
+        bands = self._pred_buf[:, : len(windows)]
+        self.forecaster.predict_into(windows, bands[0], bands[1], bands[2])
+        scores, alarms = self.anomaly.score_many(windows)
+        return bands, scores, alarms
+
+    def _act_on(
+        self,
+        rack: str,
+        metrics: Dict[str, Any],
+        now_ts: str,
+        window: np.ndarray,
+        preds: np.ndarray,
+        lo: np.ndarray,
+        hi: np.ndarray,
+        score: float,
+        alarm: bool,
+    ) -> None:
+        self.db.insert_forecast(
+            now_ts,
+            60,
+            rack,
+            float(preds[0]) if len(preds) else None,
+            float(lo[0]) if len(lo) else None,
+            float(hi[0]) if len(hi) else None,
+            None,
         )
-        triggers: List[str] = []
-        temp_limit = self.policy["limits"]["temp_c"]["max"]
-        forecast_target = None
-        if preds:
-            idx = 5 if len(preds) > 5 else 0
-            forecast_target = preds[idx]
-        if alarm:
-            triggers.append("vae")
+        self.db.insert_anomaly(now_ts, rack, score, self.anomaly.threshold, 1 if alarm else 0)
         current_temp = metrics.get("temp_c")
-        if current_temp is not None and current_temp >= temp_limit:
-            triggers.append("temp_limit")
-        if forecast_target is not None and forecast_target >= temp_limit:
-            triggers.append("forecast")
-        if len(window) >= 6:
-            delta = window[-1] - window[-6]
-            if delta >= 0.8:
-                triggers.append("temp_trend")
         power_kw = metrics.get("power_kw")
-        if power_kw is not None and power_kw >= self.policy.get("power_alarm_kw", 5.5):
-            triggers.append("power_spike")
         hum = metrics.get("hum_pct")
-        humidity_limits = self.policy.get("humidity", {})
-        if hum is not None and humidity_limits:
-            if hum < humidity_limits.get("min", -999) or hum > humidity_limits.get("max", 999):
-                triggers.append("humidity")
+        mask = _evaluate_triggers(
+            window,
+            preds,
+            bool(alarm),
+            _NAN if current_temp is None else float(current_temp),
+            _NAN if power_kw is None else float(power_kw),
+            _NAN if hum is None else float(hum),
+            self._temp_max,
+            self._power_alarm,
+            self._hum_min,
+            self._hum_max,
+        )
+        triggers = [name for bit, name in _TRIGGER_BITS if mask & bit]
         if not triggers:
             return
         current = {"supply_temp_c": 18.0, "fan_rpm": 1200}
         proposal = self.controller.propose(preds, current)
         safe = self.safety.enforce(current, proposal)
-        explanation = self._explain_action(rack, preds, score, triggers)
+        explanation = self._explain_action_lazy(rack, preds, score, triggers)
+        if not (self.auto_enabled and self.mode.startswith("auto")):
+            # proposals are read by operators, so spell the message out now
+            self._finalize_explanation(explanation)
         device_id = self._device_for_rack(rack) or self.policy.get("site", "device")
-        reason = "forecast_risk_high"
-        if "temp_limit" in triggers:
-            reason = "temperature_limit"
-        elif "temp_trend" in triggers:
-            reason = "temperature_trend"
-        elif "power_spike" in triggers:
-            reason = "power_spike"
-        elif "humidity" in triggers:
-            reason = "humidity_out_of_range"
-        elif "vae" in triggers:
-            reason = "anomaly"
-        action_payload = {
-            "ts": datetime.now(timezone.utc).isoformat(),
-            "device_id": device_id,
-            "cmd": "setpoints",
-            "set": {k: safe[k] for k in ("supply_temp_c", "fan_rpm")},
-            "mode": self.mode,
-            "reason": reason,
-            "ticket": "HCAI-BOOTSTRAP",
-            "constraints": self.policy.get("limits", {}),
-            "safety_summary": safe["safety_summary"],
-            "explain": explanation,
-        }
-        status = "pending_manual" if not self.auto_enabled else "queued"
+        trigger_set = set(triggers)
+        reason = next((r for t, r in self._REASON_PRIORITY if t in trigger_set), "forecast_risk_high")
+        action_payload = self._action_tpl.copy()
+        action_payload["ts"] = now_ts
+        action_payload["device_id"] = device_id
+        action_payload["set"] = {"supply_temp_c": safe["supply_temp_c"], "fan_rpm": safe["fan_rpm"]}
+        action_payload["mode"] = self.mode
+        action_payload["reason"] = reason
+        action_payload["constraints"] = self._limits
+        action_payload["safety_summary"] = safe["safety_summary"]
+        action_payload["explain"] = explanation
+        try:
+            self._action_q.put_nowait((action_payload, self.mode, self.auto_enabled))
+        except queue.Full:
+            ACTIONS_DROPPED_TOTAL.inc()
+
+    def _action_worker(self) -> None:
+        # SQL writes and MQTT publishes for actions stay off the ingest callback
+        failing = False
+        while True:
+            action_payload, mode, auto_enabled = self._action_q.get()
+            try:
+                self._emit_action(action_payload, mode, auto_enabled)
+            except Exception:  # one failed emit must not kill the worker
+                ACTIONS_FAILED_TOTAL.inc()
+                if not failing:
+                    logger.exception("action for %s could not be stored or published", action_payload.get("device_id"))
+                failing = True
+            else:
+                failing = False
+            finally:
+                self._action_q.task_done()
+
+    def _emit_action(self, action_payload: Dict[str, Any], mode: str, auto_enabled: bool) -> None:
+        # auto-mode actions defer message formatting to this worker, before it is stored and published
+        self._finalize_explanation(action_payload["explain"])
+        status = "pending_manual" if not auto_enabled else "queued"
+        # one encode feeds both the actions row and the MQTT publish
+        payload_bytes = orjson.dumps(action_payload)
         action_id = self.db.record_action(
-            {
-                "ts": action_payload["ts"],
-                "device_id": action_payload["device_id"],
-                "cmd_json": action_payload,
-                "mode": self.mode,
-                "status": status,
-                "reason": action_payload["reason"],
-                "model_version": "bootstrap",
-                "safety_summary": safe["safety_summary"],
-            }
+            action_payload["ts"],
+            action_payload["device_id"],
+            payload_bytes.decode(),
+            mode,
+            status,
+            action_payload["reason"],
+            "bootstrap",
+            action_payload["safety_summary"],
         )
-        if self.auto_enabled and self.mode.startswith("auto"):
-            topic = f"ctrl/{action_payload['device_id']}/set"
-            self.bus.publish(topic, action_payload)
+        if auto_enabled and mode.startswith("auto"):
+            topic = self._ctrl_topic(action_payload["device_id"])
+            self.bus.publish_batched(topic, payload_bytes)
             self.db.update_action_status(action_id, "sent")
         else:
             topic = "ctrl/proposals"
-            self.bus.publish(topic, action_payload)
+            self.bus.publish_batched(topic, payload_bytes)
             self.db.update_action_status(action_id, "pending_manual")
 
+    def _ctrl_topic(self, device_id: str) -> str:
+        topic = self._ctrl_topic_cache.get(device_id)
+        if topic is None:
+            if len(self._ctrl_topic_cache) >= CTRL_TOPIC_CACHE_MAX:
+                self._ctrl_topic_cache.clear()
+            topic = self._ctrl_topic_cache[device_id] = f"ctrl/{device_id}/set"
+        return topic
+
+    def _refresh_policy_cache(self) -> None:
+        # _maybe_act runs per message; resolve the nested policy lookups once
+        self._limits = self.policy.get("limits", {})
+        self._temp_max = float(self.policy["limits"]["temp_c"]["max"])
+        self._power_alarm = float(self.policy.get("power_alarm_kw", 5.5))
+        humidity = self.policy.get("humidity", {})
+        # no humidity policy means no humidity trigger: open the band all the way
+        self._hum_min = float(humidity.get("min", -999)) if humidity else -math.inf
+        self._hum_max = float(humidity.get("max", 999)) if humidity else math.inf
+
     def start_discovery(self, subnet: str, actor: str = "system") -> None:
-        now = datetime.now(timezone.utc)
-        payload = {"subnet": subnet, "ts": now.isoformat(), "actor": actor}
-        self.bus.publish("ctrl/discover/start", payload)
-        record_audit(self.db, actor, "discover_start", payload)
+        now = utc_now_iso()
+        payload = {"subnet": subnet, "ts": now, "actor": actor}
+        self.bus.publish("ctrl/discover/start", orjson.dumps(payload))
+        self._queue_audit(actor, "discover_start", payload)
         DISCOVER_SCANS_TOTAL.inc()
         self.discovery_results = []
         self.discovery_state = {
             "status": "running",
             "message": f"Scanning {subnet}",
-            "started_at": now.isoformat(),
+            "started_at": now,
             "error": None,
         }
-        self.discovery_deadline = now + timedelta(seconds=self.discovery_timeout)
+        self.discovery_deadline = time.monotonic() + self.discovery_timeout
 
     def list_discoveries(self) -> Dict[str, Any]:
         if (
             self.discovery_state.get("status") == "running"
             and self.discovery_deadline
-            and datetime.now(timezone.utc) > self.discovery_deadline
+            and time.monotonic() > self.discovery_deadline
         ):
             self.discovery_state = {
                 "status": "error",
@@ -271,21 +610,21 @@ class DecisionEngine:
         return {
             "devices": self.discovery_results,
             "state": self.discovery_state,
-            "history": self.discovery_history[-10:],
+            "history": list(self.discovery_history)[-10:],
         }
 
     def approve_device(self, device: Dict[str, Any]) -> str:
         action = append_device(device)
         self._reload_devices()
         DISCOVER_DEVICES_APPROVED_TOTAL.inc()
-        record_audit(self.db, "system", "discover_approve", {**device, "action": action})
+        self._queue_audit("system", "discover_approve", {**device, "action": action})
         return action
 
     def remove_device_entry(self, device_id: str) -> bool:
         removed = remove_device(device_id)
         if removed:
             self._reload_devices()
-            record_audit(self.db, "system", "device_remove", {"device_id": device_id})
+            self._queue_audit("system", "device_remove", {"device_id": device_id})
         return removed
 
     def get_recent_actions(self, limit: int = 10) -> List[Dict[str, Any]]:
@@ -309,40 +648,55 @@ class DecisionEngine:
 
     def set_mode(self, mode: str) -> None:
         self.mode = mode
-        record_audit(self.db, "system", "mode_change", {"mode": mode})
+        self._queue_audit("system", "mode_change", {"mode": mode})
 
     def set_auto(self, enabled: bool) -> None:
         self.auto_enabled = enabled
-        record_audit(self.db, "system", "auto_toggle", {"auto_enabled": enabled})
+        self._queue_audit("system", "auto_toggle", {"auto_enabled": enabled})
 
     def approve_action(self, action_id: int) -> bool:
         action = self.db.get("actions", action_id)
         if not action:
             return False
-        cmd_json = json.loads(action["cmd_json"]) if isinstance(action["cmd_json"], str) else action["cmd_json"]
-        topic = f"ctrl/{cmd_json['device_id']}/set"
-        self.bus.publish(topic, cmd_json)
+        stored = action["cmd_json"]
+        if isinstance(stored, str):
+            # republish the stored JSON text as-is; parse only for the target device
+            payload: dict | bytes = stored.encode()
+            cmd_json = orjson.loads(payload)
+        else:
+            payload = cmd_json = stored
+        topic = self._ctrl_topic(cmd_json["device_id"])
+        self.bus.publish(topic, payload)
         self.db.update_action_status(action_id, "sent")
         return True
 
-    def _explain_action(
-        self, rack: str, forecast: List[float], anomaly_score: float, triggers: List[str]
+    def _explain_action_lazy(
+        self, rack: str, forecast: np.ndarray, anomaly_score: float, triggers: List[str]
     ) -> Dict[str, Any]:
-        next_temp = forecast[0] if forecast else None
-        trigger_msg = ", ".join(triggers) if triggers else "policy"
-        if next_temp is not None:
-            temp_text = f"{next_temp:.1f}C"
-        else:
-            temp_text = "n/a"
-        message = f"Triggers: {trigger_msg}. Forecast {temp_text}, risk {anomaly_score:.3f}."
+        # everything but the human-readable message; _finalize_explanation adds that
         return {
             "rack": rack,
-            "forecast_temp": next_temp,
+            "forecast_temp": float(forecast[0]) if len(forecast) else None,
             "risk_score": anomaly_score,
             "triggers": triggers,
-            "message": message,
         }
 
+    @staticmethod
+    def _finalize_explanation(explanation: Dict[str, Any]) -> Dict[str, Any]:
+        if "message" in explanation:
+            return explanation
+        next_temp = explanation["forecast_temp"]
+        triggers = explanation["triggers"]
+        trigger_msg = ", ".join(triggers) if triggers else "policy"
+        if next_temp is not None:
+            temp_text = f"{next_temp:.1f}C"
+        else:
+            temp_text = "n/a"
+        explanation["message"] = (
+            f"Triggers: {trigger_msg}. Forecast {temp_text}, risk {explanation['risk_score']:.3f}."
+        )
+        return explanation
+
     def _reload_devices(self) -> None:
         data = get_devices()
         rack_map: Dict[str, str] = {}
@@ -363,10 +717,14 @@ class DecisionEngine:
     def _device_for_rack(self, rack: str) -> str | None:
         if rack in self.dynamic_devices:
             return self.dynamic_devices[rack]
-        try:
-            current_mtime = self.devices_path.stat().st_mtime
-        except FileNotFoundError:
-            current_mtime = 0.0
-        if current_mtime != self.devices_mtime:
-            self._reload_devices()
+        # approvals/removals reload via MQTT; the timed stat only catches hand edits to devices.yaml
+        now = time.monotonic()
+        if now >= self._devices_stat_deadline:
+            self._devices_stat_deadline = now + self._devices_stat_interval
+            try:
+                current_mtime = self.devices_path.stat().st_mtime
+            except FileNotFoundError:
+                current_mtime = 0.0
+            if current_mtime != self.devices_mtime:
+                self._reload_devices()
         return self.rack_device_map.get(rack)
@@ -1,28 +1,67 @@
+import math
 from typing import Dict
 
+from ..jit import njit
+
+
+@njit(cache=True)
+def _enforce_kernel(
+    prev_temp: float,
+    prev_fan: float,
+    new_temp: float,
+    new_fan: float,
+    tmin: float,
+    tmax: float,
+    fmin: float,
+    fmax: float,
+    dtmax: float,
+    dfmax: float,
+) -> tuple[float, float]:
+    # clamp to limits, then rate-limit against the previous setpoint; NaN prev means no previous value
+    temp = max(tmin, min(tmax, new_temp))
+    fan = max(fmin, min(fmax, new_fan))
+    if not math.isnan(prev_temp) and abs(temp - prev_temp) > dtmax:
+        temp = prev_temp + (dtmax if temp > prev_temp else -dtmax)
+    if not math.isnan(prev_fan) and abs(fan - prev_fan) > dfmax:
+        fan = prev_fan + (dfmax if fan > prev_fan else -dfmax)
+    return temp, fan
+
 
 class Safety:
     def __init__(self, limits: Dict[str, Dict[str, float]]) -> None:
         self.limits = limits
-
-    @staticmethod
-    def _rate_limit(prev: float | None, new: float, max_delta: float) -> float:
-        if prev is None:
-            return new
-        delta = new - prev
-        if abs(delta) > max_delta:
-            return prev + (max_delta if delta > 0 else -max_delta)
-        return new
+        temp_limits = limits["temp_c"]
+        fan_limits = limits["fan_rpm"]
+        self._temp_bounds = (
+            float(temp_limits["min"]),
+            float(temp_limits["max"]),
+            float(temp_limits["max_delta_per_min"]),
+        )
+        self._fan_bounds = (
+            float(fan_limits["min"]),
+            float(fan_limits["max"]),
+            float(fan_limits["max_delta_per_min"]),
+        )
 
     def enforce(self, current: Dict[str, float], proposed: Dict[str, float]) -> Dict[str, float]:
-        out = {}
-        temp_limits = self.limits["temp_c"]
-        fan_limits = self.limits["fan_rpm"]
-        temp = max(temp_limits["min"], min(temp_limits["max"], proposed["supply_temp_c"]))
-        fan = max(fan_limits["min"], min(fan_limits["max"], proposed["fan_rpm"]))
-        temp = self._rate_limit(current.get("supply_temp_c"), temp, temp_limits["max_delta_per_min"])
-        fan = self._rate_limit(current.get("fan_rpm"), fan, fan_limits["max_delta_per_min"])
-        out["supply_temp_c"] = round(temp, 1)
-        out["fan_rpm"] = int(fan)
-        out["safety_summary"] = "limits, rate limits applied"
-        return out
+        tmin, tmax, dtmax = self._temp_bounds
+        fmin, fmax, dfmax = self._fan_bounds
+        prev_temp = current.get("supply_temp_c")
+        prev_fan = current.get("fan_rpm")
+        temp, fan = _enforce_kernel(
+            math.nan if prev_temp is None else float(prev_temp),
+            math.nan if prev_fan is None else float(prev_fan),
+            float(proposed["supply_temp_c"]),
+            float(proposed["fan_rpm"]),
+            tmin,
+            tmax,
+            fmin,
+            fmax,
+            dtmax,
+            dfmax,
+        )
+        return {
+            "supply_temp_c": round(temp, 1),
+            "fan_rpm": int(fan),
+            "safety_summary": "limits, rate limits applied",
+        }
@@ -1,16 +1,20 @@
-from datetime import datetime, timezone
-from typing import Dict
+from typing import Any, Dict
 
+import orjson
+
+from ..clock import utc_now_iso
 from .db import DB
 
 
+def audit_row(actor: str, action: str, payload: Dict) -> Dict[str, Any]:
+    return {
+        "ts": utc_now_iso(),
+        "actor": actor,
+        "action": action,
+        # JSON rather than repr(): cheaper, and readable back with any JSON parser
+        "payload": orjson.dumps(payload, default=str).decode(),
+    }
+
+
 def record_audit(db: DB, actor: str, action: str, payload: Dict) -> None:
-    db.insert(
-        "audits",
-        {
-            "ts": datetime.now(timezone.utc).isoformat(),
-            "actor": actor,
-            "action": action,
-            "payload": str(payload),
-        },
-    )
+    db.insert("audits", audit_row(actor, action, payload))
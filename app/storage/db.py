@@ -1,8 +1,19 @@
-import json
+import atexit
+import logging
+import queue
 import sqlite3
 import threading
+import time
+import zlib
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Dict, Iterator
+
+import orjson
+
+from ..metrics import DB_ROWS_DROPPED_TOTAL
+
+logger = logging.getLogger(__name__)
 
 SCHEMA = """
 CREATE TABLE IF NOT EXISTS telemetry (
@@ -14,7 +25,7 @@ CREATE TABLE IF NOT EXISTS telemetry (
   hum_pct REAL,
   power_kw REAL,
   airflow_cfm REAL,
-  raw_json TEXT
+  raw_json BLOB
 );
 CREATE TABLE IF NOT EXISTS forecasts (
   id INTEGER PRIMARY KEY,
@@ -61,28 +72,187 @@ CREATE TABLE IF NOT EXISTS audits (
   action TEXT NOT NULL,
   payload TEXT
 );
+-- history/latest-point lookups filter by rack and walk ts backwards
+CREATE INDEX IF NOT EXISTS ix_telem_rack_ts ON telemetry(rack, ts);
 """
 
+# WAL lets the API read while the writer commits; NORMAL only fsyncs at checkpoints under WAL
+PRAGMAS = """
+PRAGMA journal_mode=WAL;
+PRAGMA synchronous=NORMAL;
+PRAGMA temp_store=MEMORY;
+PRAGMA cache_size=-65536;
+PRAGMA mmap_size=268435456;
+"""
+
+# telemetry.raw_json holds raw deflate primed with a typical message, so the repeated keys
+# cost a back-reference instead of their text; rows written before this are plain JSON text
+RAW_ZDICT = (
+    b'{"ts":"2026-01-01T00:00:00Z","site":"dc1","rack":"R01","device_id":"crac_01","metrics":'
+    b'{"temp_c":24.00,"hum_pct":45.00,"power_kw":3.50,"airflow_cfm":150.00,"fan_rpm":1200.0,"ups_load_pct":35.00}}'
+)
+
+
+def pack_raw(raw: bytes) -> bytes:
+    packer = zlib.compressobj(6, zlib.DEFLATED, -15, 8, zlib.Z_DEFAULT_STRATEGY, RAW_ZDICT)
+    return packer.compress(raw) + packer.flush()
+
+
+def unpack_raw(value: bytes | str | None) -> bytes | None:
+    if value is None or isinstance(value, str):
+        return value.encode() if value is not None else None
+    unpacker = zlib.decompressobj(-15, RAW_ZDICT)
+    return unpacker.decompress(value) + unpacker.flush()
+
+
+# fixed column orders for the per-message tables; rows for these skip the dict entirely
+TELEMETRY_COLUMNS = ("ts", "site", "rack", "temp_c", "hum_pct", "power_kw", "airflow_cfm", "raw_json")
+FORECAST_COLUMNS = ("ts", "horizon_s", "rack", "temp_pred", "temp_lo", "temp_hi", "power_pred")
+ANOMALY_COLUMNS = ("ts", "rack", "score", "threshold", "is_alarm")
+RECEIPTS_TABLE = "receipts"
+RECEIPT_COLUMNS = ("ts", "device_id", "status", "applied_json", "latency_ms", "notes")
+
 
 class DB:
-    def __init__(self, path: str) -> None:
+    def __init__(self, path: str, batch_size: int = 64, idle_flush_ms: int = 50) -> None:
         self.path = Path(path)
         self.path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        # autocommit mode; write paths open explicit BEGIN IMMEDIATE transactions via _transaction()
+        self.conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
         self.conn.row_factory = sqlite3.Row
         self.lock = threading.Lock()
+        self._stmt_cache: Dict[tuple[str, tuple[str, ...]], str] = {}
         self._init()
+        # insert() only enqueues; one writer thread commits up to batch_size rows per transaction
+        self._write_q: "queue.Queue[tuple[str, tuple[str, ...], tuple[Any, ...]]]" = queue.Queue()
+        self._batch_size = batch_size
+        self._idle_flush_s = idle_flush_ms / 1000
+        threading.Thread(target=self._flush_loop, name="hcai-db-writer", daemon=True).start()
+        atexit.register(self.flush)
 
     def _init(self) -> None:
-        with self.lock, self.conn:
+        with self.lock:
+            self.conn.executescript(PRAGMAS)
             self.conn.executescript(SCHEMA)
 
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        with self.lock:
+            self.conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield self.conn
+            except BaseException:
+                self.conn.execute("ROLLBACK")
+                raise
+            self.conn.execute("COMMIT")
+
+    def _insert_sql(self, table: str, keys: tuple[str, ...]) -> str:
+        key = (table, keys)
+        sql = self._stmt_cache.get(key)
+        if sql is None:
+            cols = ",".join(keys)
+            placeholders = ",".join("?" * len(keys))
+            sql = self._stmt_cache[key] = f"INSERT INTO {table} ({cols}) VALUES ({placeholders})"
+        return sql
+
+    # rows travel as (table, columns, values) and bind positionally; dicts keep their key order
     def insert(self, table: str, payload: Dict[str, Any]) -> None:
-        cols = ",".join(payload.keys())
-        placeholders = ":" + ",:".join(payload.keys())
-        sql = f"INSERT INTO {table} ({cols}) VALUES ({placeholders})"
-        with self.lock, self.conn:
-            self.conn.execute(sql, payload)
+        self._write_q.put((table, tuple(payload), tuple(payload.values())))
+
+    def insert_many(self, table: str, rows: list[Dict[str, Any]]) -> None:
+        for row in rows:
+            self._write_q.put((table, tuple(row), tuple(row.values())))
+
+    def insert_telemetry(
+        self,
+        ts: str,
+        site: str | None,
+        rack: str,
+        temp_c: float | None,
+        hum_pct: float | None,
+        power_kw: float | None,
+        airflow_cfm: float | None,
+        raw_json: bytes | None,
+    ) -> None:
+        self._write_q.put(
+            ("telemetry", TELEMETRY_COLUMNS, (ts, site, rack, temp_c, hum_pct, power_kw, airflow_cfm, raw_json))
+        )
+
+    def insert_forecast(
+        self,
+        ts: str,
+        horizon_s: int,
+        rack: str,
+        temp_pred: float | None,
+        temp_lo: float | None,
+        temp_hi: float | None,
+        power_pred: float | None,
+    ) -> None:
+        self._write_q.put(("forecasts", FORECAST_COLUMNS, (ts, horizon_s, rack, temp_pred, temp_lo, temp_hi, power_pred)))
+
+    def insert_anomaly(self, ts: str, rack: str, score: float, threshold: float, is_alarm: int) -> None:
+        self._write_q.put(("anomalies", ANOMALY_COLUMNS, (ts, rack, score, threshold, is_alarm)))
+
+    def insert_sync(self, table: str, payload: Dict[str, Any]) -> None:
+        self._insert_row_sync(table, tuple(payload), tuple(payload.values()))
+
+    def _insert_row_sync(self, table: str, keys: tuple[str, ...], values: tuple[Any, ...]) -> None:
+        with self._transaction():
+            self.conn.execute(self._insert_sql(table, keys), values)
+
+    def flush(self) -> None:
+        # blocks until everything queued so far is committed
+        self._write_q.join()
+
+    def _flush_loop(self) -> None:
+        while True:
+            batch = [self._write_q.get()]
+            deadline = time.monotonic() + self._idle_flush_s
+            while len(batch) < self._batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(self._write_q.get(timeout=timeout))
+                except queue.Empty:
+                    break
+            try:
+                self._write_batch(batch)
+            finally:
+                for _ in batch:
+                    self._write_q.task_done()
+
+    def _write_batch(self, batch: list[tuple[str, tuple[str, ...], tuple[Any, ...]]]) -> None:
+        grouped: Dict[tuple[str, tuple[str, ...]], list[tuple[Any, ...]]] = {}
+        for table, keys, values in batch:
+            grouped.setdefault((table, keys), []).append(values)
+        try:
+            with self._transaction():
+                for (table, keys), rows in grouped.items():
+                    self.conn.executemany(self._insert_sql(table, keys), rows)
+        except sqlite3.Error as batch_exc:
+            # one bad row must not cost the whole batch; retry row by row and drop the failures
+            dropped: Dict[str, int] = {}
+            last_exc: sqlite3.Error = batch_exc
+            for table, keys, values in batch:
+                try:
+                    self._insert_row_sync(table, keys, values)
+                except sqlite3.Error as exc:
+                    dropped[table] = dropped.get(table, 0) + 1
+                    last_exc = exc
+            if dropped:
+                for table, count in dropped.items():
+                    DB_ROWS_DROPPED_TOTAL.labels(table=table).inc(count)
+                logger.warning("dropped %d of %d queued rows %s: %s", sum(dropped.values()), len(batch), dropped, last_exc)
+
+    def record_audit_batch(self, rows: list[Dict[str, Any]]) -> None:
+        # multi-row VALUES, chunked to stay well under SQLite's bound-parameter limit
+        with self._transaction():
+            for start in range(0, len(rows), 200):
+                chunk = rows[start : start + 200]
+                sql = "INSERT INTO audits (ts, actor, action, payload) VALUES " + ",".join(["(?,?,?,?)"] * len(chunk))
+                params = [v for r in chunk for v in (r["ts"], r["actor"], r["action"], r["payload"])]
+                self.conn.execute(sql, params)
 
     def latest(self, table: str, limit: int = 50) -> list[Dict[str, Any]]:
         with self.lock:
@@ -97,17 +267,17 @@ class DB:
             return dict(row) if row else None
 
     def update_action_status(self, action_id: int, status: str) -> None:
-        with self.lock, self.conn:
+        with self._transaction():
             self.conn.execute(
                 "UPDATE actions SET status = :status WHERE id = :id",
                 {"status": status, "id": action_id},
             )
 
     def update_action_cmd(self, action_id: int, new_cmd: Dict[str, Any]) -> None:
-        with self.lock, self.conn:
+        with self._transaction():
             self.conn.execute(
                 "UPDATE actions SET cmd_json = :cmd WHERE id = :id",
-                {"cmd": json.dumps(new_cmd), "id": action_id},
+                {"cmd": orjson.dumps(new_cmd).decode(), "id": action_id},
             )
 
     def telemetry_history(self, rack: str, limit: int = 120) -> list[Dict[str, Any]]:
@@ -128,22 +298,51 @@ class DB:
             row = cur.fetchone()
             return dict(row) if row else None
 
-    def record_action(self, action: Dict[str, Any]) -> int:
-        payload = action.copy()
-        if isinstance(payload.get("cmd_json"), dict):
-            payload["cmd_json"] = json.dumps(payload["cmd_json"])
-        if isinstance(payload.get("safety_summary"), dict):
-            payload["safety_summary"] = json.dumps(payload["safety_summary"])
-        with self.lock, self.conn:
+    def latest_points(self, racks: list[str]) -> Dict[str, Dict[str, Any]]:
+        racks = list(dict.fromkeys(racks))
+        if not racks:
+            return {}
+        placeholders = ",".join("?" * len(racks))
+        # SQLite fills bare columns next to MAX() from the row holding the maximum
+        sql = (
+            "SELECT rack, MAX(ts) AS ts, temp_c, hum_pct, power_kw, airflow_cfm FROM telemetry "
+            f"WHERE rack IN ({placeholders}) GROUP BY rack"
+        )
+        with self.lock:
+            rows = self.conn.execute(sql, racks).fetchall()
+        points: Dict[str, Dict[str, Any]] = {}
+        for row in rows:
+            point = dict(row)
+            points[point.pop("rack")] = point
+        return points
+
+    # callers pass already-encoded JSON text; these go straight to positional parameters
+    def record_action(
+        self,
+        ts: str,
+        device_id: str,
+        cmd_json: str,
+        mode: str,
+        status: str,
+        reason: str,
+        model_version: str,
+        safety_summary: str | None,
+    ) -> int:
+        with self._transaction():
             cur = self.conn.execute(
                 "INSERT INTO actions (ts, device_id, cmd_json, mode, status, reason, model_version, safety_summary) "
-                "VALUES (:ts, :device_id, :cmd_json, :mode, :status, :reason, :model_version, :safety_summary)",
-                payload,
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (ts, device_id, cmd_json, mode, status, reason, model_version, safety_summary),
             )
             return cur.lastrowid
 
-    def record_receipt(self, receipt: Dict[str, Any]) -> None:
-        payload = receipt.copy()
-        if isinstance(payload.get("applied_json"), dict):
-            payload["applied_json"] = json.dumps(payload["applied_json"])
-        self.insert("receipts", payload)
+    def record_receipt(
+        self,
+        ts: str,
+        device_id: str,
+        status: str,
+        applied_json: str | None,
+        latency_ms: int | None,
+        notes: str | None,
+    ) -> None:
+        self._write_q.put((RECEIPTS_TABLE, RECEIPT_COLUMNS, (ts, device_id, status, applied_json, latency_ms, notes)))
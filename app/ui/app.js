@@ -558,12 +558,13 @@ function initModeSelect() {
 function initWebSocket() {
   const ws = new WebSocket(`ws://${window.location.host}/ws`);
   ws.onmessage = (event) => {
+    // frames only carry the sections that changed since the previous frame
     const payload = JSON.parse(event.data);
-    renderTiles(payload.tiles);
-    renderDiscovery(payload.discover);
-    renderActions(payload.actions);
-    renderAnomalies(payload.anomalies);
-    renderStatus(payload.status);
+    if ('tiles' in payload) renderTiles(payload.tiles);
+    if ('discover' in payload) renderDiscovery(payload.discover);
+    if ('actions' in payload) renderActions(payload.actions);
+    if ('anomalies' in payload) renderAnomalies(payload.anomalies);
+    if ('status' in payload) renderStatus(payload.status);
   };
   ws.onclose = () => setTimeout(initWebSocket, 2000);
   ws.onerror = () => ws.close();
@@ -1,16 +1,27 @@
-import json
+import inspect
+import logging
 import os
+import queue
+import socket
 import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
+import orjson
 import yaml
 from paho.mqtt import client as mqtt
 from pymodbus.client import ModbusTcpClient
 
+from .clock import now_ts
 from .discover import DiscoveryService
 
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # pragma: no cover - PyYAML built without libyaml
+    from yaml import SafeLoader as YamlLoader
+
 try:
     from pysnmp.hlapi import (
         CommunityData,
@@ -26,6 +37,8 @@ try:
 except ImportError:  # pragma: no cover
     HAS_SNMP = False
 
+logger = logging.getLogger(__name__)
+
 MQTT_URL = os.environ.get("MQTT_URL", "mqtt://localhost:1883")
 MQTT_USER = os.environ.get("MQTT_USER", "")
 MQTT_PASS = os.environ.get("MQTT_PASS", "")
@@ -35,6 +48,12 @@ DISCOVERY_ENABLED = os.environ.get("DISCOVERY_ENABLED", "true").lower() == "true
 DEFAULT_SITE = os.environ.get("SITE_ID", "dc1")
 DEFAULT_POLL_INTERVAL = float(os.environ.get("POLL_INTERVAL", "10"))
 SNMP_COMMUNITY = os.environ.get("DISCOVERY_SNMP_COMMUNITY", "public")
+REGISTRY_WATCH_INTERVAL_S = float(os.environ.get("REGISTRY_WATCH_INTERVAL_S", "2"))
+# opt-in: coalesce poller readings into site/<site>/telemetry/batch messages. Off by default
+# because other subscribers may only listen on the per-rack topics
+TELEMETRY_BATCH = os.environ.get("TELEMETRY_BATCH", "false").lower() == "true"
+TELEMETRY_BATCH_MAX = 64
+TELEMETRY_BATCH_WAIT_S = 0.05
 
 
 def parse_url(url: str) -> tuple[str, int]:
@@ -51,20 +70,53 @@ class DeviceRegistry:
         self.map_file = map_file
         self.devices: Dict[str, Dict] = {}
         self.maps: Dict[str, Dict] = {}
+        # path -> ((mtime_ns, size), parsed document); approvals arrive in bursts, parse each change once
+        self._parsed: Dict[Path, Tuple[Tuple[int, int], Dict]] = {}
+        # file versions the current devices/maps were built from
+        self._applied: Tuple[Optional[Tuple[int, int]], ...] = ()
         self.reload()
 
+    @staticmethod
+    def _version(path: Path) -> Optional[Tuple[int, int]]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, path: Path) -> Optional[Dict]:
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._parsed.pop(path, None)
+            return None
+        key = (stat.st_mtime_ns, stat.st_size)
+        cached = self._parsed.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with path.open("r", encoding="utf-8") as handle:
+            data = yaml.load(handle, Loader=YamlLoader) or {}
+        self._parsed[path] = (key, data)
+        return data
+
+    def reload_if_changed(self) -> bool:
+        # rebuilding from disk drops in-memory approvals/removals, so only do it when a file moved on
+        if tuple(self._version(p) for p in (self.devices_path, self.map_file)) == self._applied:
+            return False
+        self.reload()
+        return True
+
     def reload(self) -> None:
+        self._applied = tuple(self._version(p) for p in (self.devices_path, self.map_file))
         combined_maps: Dict[str, Dict] = {}
-        if self.devices_path.exists():
-            with self.devices_path.open("r", encoding="utf-8") as handle:
-                data = yaml.safe_load(handle) or {}
+        data = self._load(self.devices_path)
+        if data is not None:
             self.devices = {item["id"]: item for item in data.get("devices", [])}
             combined_maps.update(data.get("maps", {}))
         else:
             self.devices = {}
-        if self.map_file.exists():
-            with self.map_file.open("r", encoding="utf-8") as handle:
-                data = yaml.safe_load(handle) or {}
+        data = self._load(self.map_file)
+        if data is not None:
             combined_maps.update(data.get("maps", {}))
         self.maps = combined_maps
 
@@ -111,6 +163,90 @@ if MQTT_USER:
     client.username_pw_set(MQTT_USER, MQTT_PASS)
 pollers_lock = threading.Lock()
 pollers: Dict[str, "TelemetryPoller"] = {}
+telemetry_q: "queue.Queue[Dict[str, Any]]" = queue.Queue(maxsize=4096)
+# set while the broker session is up; pollers hold off instead of filling paho's outgoing queue
+mqtt_connected = threading.Event()
+
+
+def publish_telemetry(payload: Dict[str, Any]) -> None:
+    if not TELEMETRY_BATCH:
+        client.publish(f"site/{payload['site']}/rack/{payload['rack']}/telemetry", orjson.dumps(payload), qos=1)
+        return
+    try:
+        telemetry_q.put_nowait(payload)
+    except queue.Full:  # broker unreachable for a while: newest readings win next cycle
+        pass
+
+
+def telemetry_publisher() -> None:
+    # waits at most TELEMETRY_BATCH_WAIT_S after the first reading, then sends one message per site
+    while True:
+        batch = [telemetry_q.get()]
+        deadline = time.monotonic() + TELEMETRY_BATCH_WAIT_S
+        while len(batch) < TELEMETRY_BATCH_MAX:
+            timeout = deadline - time.monotonic()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(telemetry_q.get(timeout=timeout))
+            except queue.Empty:
+                break
+        by_site: Dict[str, List[Dict[str, Any]]] = {}
+        for payload in batch:
+            by_site.setdefault(payload["site"], []).append(payload)
+        for site, items in by_site.items():
+            if len(items) == 1:
+                item = items[0]
+                client.publish(f"site/{site}/rack/{item['rack']}/telemetry", orjson.dumps(item), qos=1)
+            else:
+                client.publish(f"site/{site}/telemetry/batch", orjson.dumps({"site": site, "racks": items}), qos=1)
+
+
+# the unit-id keyword was renamed across pymodbus releases (unit -> slave -> device_id)
+_READ_PARAMS = inspect.signature(ModbusTcpClient.read_holding_registers).parameters
+UNIT_KW = next((kw for kw in ("device_id", "slave", "unit") if kw in _READ_PARAMS), "unit")
+# Modbus caps a read at 125 registers; short gaps are cheaper to read through than to split on
+MODBUS_MAX_READ = 125
+MODBUS_READ_GAP = int(os.environ.get("MODBUS_READ_GAP", "8"))
+MODBUS_TIMEOUT_S = 1.0
+MODBUS_RETRIES = 0
+# (register_type, start offset, count, [(metric, index into the read, scale)])
+ReadGroup = Tuple[str, int, int, List[Tuple[str, int, float]]]
+
+
+def _read_groups(telemetry_map: Dict[str, Any]) -> List[ReadGroup]:
+    points = []
+    for name, meta in telemetry_map.items():
+        address = meta.get("address")
+        if address is None:
+            continue
+        scale = meta.get("scale", 1)
+        # a zero or non-numeric scale would raise on every poll; skip that metric instead
+        if isinstance(scale, bool) or not isinstance(scale, (int, float)) or scale == 0:
+            continue
+        reg_type = meta.get("register_type", "holding")
+        offset = address - (30001 if reg_type == "input" else 40001)
+        points.append((reg_type, offset, name, scale))
+    groups: List[ReadGroup] = []
+    for reg_type, offset, name, scale in sorted(points, key=lambda p: (p[0], p[1])):
+        if groups:
+            g_type, g_start, g_count, g_points = groups[-1]
+            if (
+                g_type == reg_type
+                and offset - (g_start + g_count) <= MODBUS_READ_GAP
+                and offset - g_start < MODBUS_MAX_READ
+            ):
+                g_points.append((name, offset - g_start, scale))
+                groups[-1] = (g_type, g_start, max(g_count, offset - g_start + 1), g_points)
+                continue
+        groups.append((reg_type, offset, 1, [(name, 0, scale)]))
+    return groups
+
+
+def _read_registers(client_mb: ModbusTcpClient, reg_type: str, start: int, count: int, unit: Dict[str, Any]) -> Any:
+    if reg_type == "input":
+        return client_mb.read_input_registers(start, count=count, **unit)
+    return client_mb.read_holding_registers(start, count=count, **unit)
 
 
 class TelemetryPoller(threading.Thread):
@@ -118,6 +254,10 @@ class TelemetryPoller(threading.Thread):
         super().__init__(daemon=True)
         self.device_id = device_id
         self.stop_event = threading.Event()
+        # read plan for the telemetry map it was built from; the registry hands back the same
+        # dict until the map file changes
+        self._groups_src: Optional[Dict[str, Any]] = None
+        self._groups: List[ReadGroup] = []
 
     def stop(self) -> None:
         self.stop_event.set()
@@ -127,17 +267,22 @@ class TelemetryPoller(threading.Thread):
             device = registry.get_device(self.device_id)
             if not device:
                 return
+            if not mqtt_connected.is_set():
+                # broker down: readings would only be stale by the time they went out, and they
+                # would take the queue space command receipts need after the reconnect
+                if self.stop_event.wait(1.0):
+                    return
+                continue
             metrics = self.collect_metrics(device)
             if metrics:
                 payload = {
-                    "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                    "ts": now_ts(),
                     "site": registry.device_site(device),
                     "rack": registry.device_rack(device),
                     "device_id": self.device_id,
                     "metrics": metrics,
                 }
-                topic = f"site/{payload['site']}/rack/{payload['rack']}/telemetry"
-                client.publish(topic, json.dumps(payload), qos=1)
+                publish_telemetry(payload)
             interval = max(1.0, registry.device_interval(device))
             if self.stop_event.wait(interval):
                 return
@@ -154,71 +299,103 @@ class TelemetryPoller(threading.Thread):
         telemetry_map = registry.get_telemetry_map(device.get("map"))
         if not telemetry_map:
             return None
-        client_mb = ModbusTcpClient(device["host"], port=device.get("port", 502), timeout=1)
+        if telemetry_map is not self._groups_src:
+            self._groups = _read_groups(telemetry_map)
+            self._groups_src = telemetry_map
+        unit = {UNIT_KW: device.get("unit_id", 1)}
         metrics: Dict[str, float] = {}
-        try:
-            if not client_mb.connect():
+        # the pooled connection stays open between polls and is shared with writes to the same endpoint
+        client_mb, lock = _modbus_client(device)
+        with lock:
+            if not _ensure_connected(client_mb):
                 return None
-            unit_id = device.get("unit_id", 1)
-            for name, meta in telemetry_map.items():
-                address = meta.get("address")
-                if address is None:
-                    continue
-                reg_type = meta.get("register_type", "holding")
-                scale = meta.get("scale", 1)
+            # one request per run of nearby registers instead of one per metric
+            for reg_type, start, count, points in self._groups:
                 try:
-                    if reg_type == "input":
-                        result = client_mb.read_input_registers(address - 30001, 1, unit=unit_id)
+                    result = _read_registers(client_mb, reg_type, start, count, unit)
+                    if result.isError() and len(points) > 1:
+                        # the span may cover registers the device does not map; read its points one by one
+                        singles = [
+                            (name, scale, _read_registers(client_mb, reg_type, start + index, 1, unit))
+                            for name, index, scale in points
+                        ]
                     else:
-                        result = client_mb.read_holding_registers(address - 40001, 1, unit=unit_id)
-                    if result.isError():
-                        continue
-                    value = result.registers[0]
-                    metrics[name] = value / scale
+                        singles = None
                 except Exception:
+                    # transport failure: drop the socket, the next poll reconnects
+                    client_mb.close()
+                    break
+                if singles is not None:
+                    for name, scale, single in singles:
+                        if not single.isError():
+                            metrics[name] = single.registers[0] / scale
                     continue
-            return metrics or None
-        finally:
-            client_mb.close()
+                if result.isError():
+                    continue
+                registers = result.registers
+                for name, index, scale in points:
+                    metrics[name] = registers[index] / scale
+        return metrics or None
 
     def collect_snmp(self, device: Dict[str, Any]) -> Optional[Dict[str, float]]:
         telemetry_map = registry.get_telemetry_map(device.get("map"))
         if not telemetry_map:
             return None
+        points = [(name, meta["oid"], meta.get("scale", 1)) for name, meta in telemetry_map.items() if meta.get("oid")]
+        if not points:
+            return None
+        engine, context = _snmp_engine()
+        auth = CommunityData(device.get("community", SNMP_COMMUNITY), mpModel=0)
+        target = UdpTransportTarget((device["host"], device.get("port", 161)), timeout=1, retries=0)
         metrics: Dict[str, float] = {}
-        for name, meta in telemetry_map.items():
-            oid = meta.get("oid")
-            if not oid:
-                continue
-            scale = meta.get("scale", 1)
-            iterator = getCmd(
-                SnmpEngine(),
-                CommunityData(device.get("community", SNMP_COMMUNITY), mpModel=0),
-                UdpTransportTarget((device["host"], device.get("port", 161)), timeout=1, retries=0),
-                ContextData(),
-                ObjectType(ObjectIdentity(oid)),
-            )
-            try:
-                errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
-            except StopIteration:
-                continue
-            if errorIndication or errorStatus:
-                continue
+        # every OID in one GET PDU; SNMPv1 fails the whole PDU on one bad OID, so fall back per OID
+        var_binds = _snmp_get(engine, auth, target, context, [oid for _, oid, _ in points])
+        if var_binds is not None:
+            values = list(zip(points, var_binds))
+        else:
+            values = []
+            for point in points:
+                single = _snmp_get(engine, auth, target, context, [point[1]])
+                if single is not None:
+                    values.append((point, single[0]))
+        for (name, _oid, scale), var_bind in values:
             try:
-                value = float(varBinds[0][1])
-                metrics[name] = value / scale
+                metrics[name] = float(var_bind[1]) / scale
             except Exception:
                 continue
         return metrics or None
 
 
+# SnmpEngine is costly to build and not thread-safe: one per poller/worker thread, reused
+_snmp_local = threading.local()
+
+
+def _snmp_engine() -> Tuple[Any, Any]:
+    engine = getattr(_snmp_local, "engine", None)
+    if engine is None:
+        engine = _snmp_local.engine = (SnmpEngine(), ContextData())
+    return engine
+
+
+def _snmp_get(engine, auth, target, context, oids: List[str]) -> Optional[List[Any]]:
+    iterator = getCmd(engine, auth, target, context, *[ObjectType(ObjectIdentity(oid)) for oid in oids])
+    try:
+        errorIndication, errorStatus, errorIndex, varBinds = next(iterator)
+    except StopIteration:
+        return None
+    if errorIndication or errorStatus:
+        return None
+    return list(varBinds)
+
+
 def sync_pollers() -> None:
     with pollers_lock:
         for device_id in list(pollers.keys()):
             if device_id not in registry.devices:
                 pollers[device_id].stop()
                 del pollers[device_id]
-        for device_id, device in registry.devices.items():
+        # snapshot: the MQTT thread and the registry watcher replace entries concurrently
+        for device_id, device in list(registry.devices.items()):
             if device_id in pollers:
                 continue
             if device.get("proto") == "snmp" and not HAS_SNMP:
@@ -228,6 +405,65 @@ def sync_pollers() -> None:
             poller = TelemetryPoller(device_id)
             pollers[device_id] = poller
             poller.start()
+    prune_modbus_pool()
+
+
+# kept connected between requests so a setpoint write does not pay a TCP handshake; one client
+# per (host, port), shared by every device and caller behind that endpoint. The sync pymodbus
+# client is not thread-safe, so hold the entry's lock for the whole request/response exchange
+modbus_pool: Dict[Tuple[str, int], Tuple[ModbusTcpClient, threading.Lock]] = {}
+modbus_pool_lock = threading.Lock()
+
+
+def _modbus_client(device: Dict[str, Any]) -> Tuple[ModbusTcpClient, threading.Lock]:
+    key = (device["host"], int(device.get("port", 502)))
+    with modbus_pool_lock:
+        entry = modbus_pool.get(key)
+        if entry is None:
+            # short timeout and no client-side retries, as before pooling: the entry lock is held for
+            # the whole exchange, so a dead endpoint must not stall every caller behind it for
+            # pymodbus' default 3 s x 3 retries. write_modbus already reconnects and retries once.
+            client_mb = ModbusTcpClient(key[0], port=key[1], timeout=MODBUS_TIMEOUT_S, retries=MODBUS_RETRIES)
+            entry = modbus_pool[key] = (client_mb, threading.Lock())
+    return entry
+
+
+def _ensure_connected(client_mb: ModbusTcpClient) -> bool:
+    # caller holds the entry lock
+    if client_mb.connected:
+        return True
+    if not client_mb.connect():
+        return False
+    sock = getattr(client_mb, "socket", None)
+    if sock is not None:
+        # idle poll intervals should not let a NAT/gateway silently drop the connection
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+    return True
+
+
+def prune_modbus_pool() -> None:
+    # close connections to endpoints no registered device uses any more
+    live = {
+        (device["host"], int(device.get("port", 502)))
+        for device in list(registry.devices.values())
+        if device.get("proto") == "modbus" and device.get("host")
+    }
+    with modbus_pool_lock:
+        stale = [modbus_pool.pop(key) for key in list(modbus_pool) if key not in live]
+    for client_mb, lock in stale:
+        with lock:
+            client_mb.close()
+
+
+def _register_runs(registers: List[Tuple[int, int]]) -> List[Tuple[int, List[int]]]:
+    # [(address, value)] -> [(start, [values])] for each run of consecutive addresses
+    runs: List[Tuple[int, List[int]]] = []
+    for address, value in sorted(registers):
+        if runs and runs[-1][0] + len(runs[-1][1]) == address:
+            runs[-1][1].append(value)
+        else:
+            runs.append((address, [value]))
+    return runs
 
 
 def write_modbus(device_id: str, setpoints: Dict[str, float]) -> None:
@@ -237,27 +473,41 @@ def write_modbus(device_id: str, setpoints: Dict[str, float]) -> None:
     register_map = registry.get_control_map(device.get("map"))
     if not register_map:
         return
-    client_mb = ModbusTcpClient(device["host"], port=device.get("port", 502))
-    if not client_mb.connect():
+    registers: List[Tuple[int, int]] = []
+    for key, value in setpoints.items():
+        entry = register_map.get("registers", {}).get(key)
+        if not entry:
+            continue
+        scale = entry.get("scale", 1)
+        registers.append((entry.get("address") - 40001, int(round(value * scale))))
+    if not registers:
         return
-    try:
-        for key, value in setpoints.items():
-            entry = register_map.get("registers", {}).get(key)
-            if not entry:
-                continue
-            scale = entry.get("scale", 1)
-            reg_value = int(round(value * scale))
-            address = entry.get("address") - 40001
-            client_mb.write_register(address, reg_value)
-    finally:
-        client_mb.close()
+    client_mb, lock = _modbus_client(device)
+    runs = _register_runs(registers)
+    unit = {UNIT_KW: device.get("unit_id", 1)}
+    with lock:
+        for attempt in (1, 2):
+            if not _ensure_connected(client_mb):
+                return
+            try:
+                for start, values in runs:
+                    if len(values) == 1:
+                        client_mb.write_register(start, values[0], **unit)
+                    else:
+                        client_mb.write_registers(start, values, **unit)
+                return
+            except Exception:
+                # a pooled socket can go stale while idle: drop it and retry once on a fresh connection
+                client_mb.close()
+                if attempt == 2:
+                    raise
 
 
 def publish_discovery(subnet: str, actor: str = "system") -> None:
     if not DISCOVERY_ENABLED:
         return
     result = discovery_service.scan(subnet)
-    ts = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+    ts = now_ts()
     raw_payload = {
         "ts": ts,
         "subnet": subnet,
@@ -272,78 +522,145 @@ def publish_discovery(subnet: str, actor: str = "system") -> None:
         "devices": result["devices"],
         "actor": actor,
     }
-    client.publish("discover/raw", json.dumps(raw_payload), qos=1, retain=False)
-    client.publish("discover/results", json.dumps(devices_payload), qos=1, retain=False)
+    # raw hits are informational and can be large; results carry the devices and stay QoS 1
+    client.publish("discover/raw", orjson.dumps(raw_payload), qos=0, retain=False)
+    client.publish("discover/results", orjson.dumps(devices_payload), qos=1, retain=False)
+
+
+# one single-thread lane per shard: commands leave the paho callback thread, but commands for
+# the same device stay in arrival order
+COMMAND_LANES = 8
+command_lanes = [
+    ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"edge-cmd-{i}") for i in range(COMMAND_LANES)
+]
 
 
 def on_command(_client, _userdata, msg) -> None:
-    payload = json.loads(msg.payload.decode())
-    device_id = payload.get("device_id")
-    if not device_id:
-        return
-    device_meta = registry.get_device(device_id)
-    if device_meta.get("proto") == "sim":
-        return
+    payload = orjson.loads(msg.payload)
+    # the API coalesces back-to-back commands for one device into {"batch": [...]}
+    for command in payload.get("batch", [payload]):
+        device_id = command.get("device_id")
+        if not device_id:
+            continue
+        command_lanes[hash(device_id) % COMMAND_LANES].submit(apply_command, device_id, command)
+
+
+def apply_command(device_id: str, payload: Dict[str, Any]) -> None:
     setpoints = payload.get("set", {})
-    write_modbus(device_id, setpoints)
+    # runs on a command lane and nobody reads its Future, so a failure is logged and sent as a receipt
+    try:
+        device_meta = registry.get_device(device_id)
+        if device_meta.get("proto") == "sim":
+            return
+        write_modbus(device_id, setpoints)
+    except Exception as exc:
+        logger.exception("command for %s failed", device_id)
+        status, applied, notes = "failed", {}, f"edge write failed: {exc}"
+    else:
+        status, applied, notes = "applied", setpoints, "edge write"
     receipt = {
-        "ts": payload.get("ts", time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())),
+        "ts": payload["ts"] if "ts" in payload else now_ts(),
         "device_id": device_id,
-        "status": "applied",
-        "applied": setpoints,
+        "status": status,
+        "applied": applied,
         "latency_ms": 100,
-        "notes": "edge write",
+        "notes": notes,
     }
-    client.publish(f"ctrl/{device_id}/receipt", json.dumps(receipt), qos=1)
+    client.publish(f"ctrl/{device_id}/receipt", orjson.dumps(receipt), qos=1)
 
 
 def on_discover(_client, _userdata, msg) -> None:
-    payload = json.loads(msg.payload.decode())
+    payload = orjson.loads(msg.payload)
     subnet = payload.get("subnet", "10.0.0.0/24")
     actor = payload.get("actor", "system")
     threading.Thread(target=publish_discovery, args=(subnet, actor), daemon=True).start()
 
 
 def on_discover_approved(_client, _userdata, msg) -> None:
-    payload = json.loads(msg.payload.decode())
+    payload = orjson.loads(msg.payload)
+    # the approval is applied in memory; the registry watcher picks up the rewritten file
     registry.update_from_payload(payload.get("device", {}))
-    registry.reload()
-    device = registry.get_device(payload.get("device", {}).get("id", ""))
+    device_id = payload.get("device", {}).get("id", "")
+    device = registry.get_device(device_id)
     if device:
-        self_test_device(device)
-    sync_pollers()
+        # same lane as the device's writes, so the callback returns before any Modbus I/O
+        command_lanes[hash(device_id) % COMMAND_LANES].submit(self_test_device, device)
+    sync_requested.set()
 
 
 def on_device_removed(_client, _userdata, msg) -> None:
-    payload = json.loads(msg.payload.decode())
+    payload = orjson.loads(msg.payload)
     device_id = payload.get("device_id")
     if not device_id:
         return
     registry.remove_device(device_id)
-    registry.reload()
-    sync_pollers()
+    sync_requested.set()
+
+
+# approvals/removals ask for a poller sync instead of running one each; a bulk approval
+# lands within the debounce window and is applied with a single sync
+sync_requested = threading.Event()
+SYNC_DEBOUNCE_S = 0.25
+
+
+def watch_registry() -> None:
+    while True:
+        requested = sync_requested.wait(REGISTRY_WATCH_INTERVAL_S)
+        if requested:
+            time.sleep(SYNC_DEBOUNCE_S)
+            sync_requested.clear()
+        try:
+            if registry.reload_if_changed() or requested:
+                sync_pollers()
+        except Exception:  # a half-written YAML file is retried on the next tick
+            pass
 
 
 def self_test_device(device: Dict[str, Any]) -> None:
     if device.get("proto") != "modbus":
         return
-    client_mb = ModbusTcpClient(device["host"], port=device.get("port", 502), timeout=1)
-    try:
-        if client_mb.connect():
-            client_mb.read_device_info()
-    finally:
-        client_mb.close()
+    client_mb, lock = _modbus_client(device)
+    with lock:
+        try:
+            if _ensure_connected(client_mb):
+                client_mb.read_device_info()
+        except Exception:
+            # submitted to a command lane without a reader, so log instead of raising into the Future
+            client_mb.close()
+            logger.exception("self-test of %s failed", device.get("id"))
+
+
+def on_connect(mqtt_client, _userdata, _flags, rc) -> None:
+    # small QoS 1 publishes and their PUBACKs should not wait on Nagle + delayed ACK
+    sock = mqtt_client.socket()
+    if sock is not None:
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    if rc == 0:
+        mqtt_connected.set()
+
+
+def on_disconnect(_client, _userdata, _rc) -> None:
+    mqtt_connected.clear()
 
 
+client.on_connect = on_connect
+client.on_disconnect = on_disconnect
 client.on_message = lambda *_: None
 client.message_callback_add("ctrl/+/set", on_command)
 client.message_callback_add("ctrl/discover/start", on_discover)
 client.message_callback_add("discover/approved", on_discover_approved)
 client.message_callback_add("discover/removed", on_device_removed)
+# pollers publish from their own threads; let QoS 1 messages pipeline while the network
+# loop runs in the background instead of on the main thread. The queue cap keeps an outage
+# from growing paho's backlog without bound: publish() returns MQTT_ERR_QUEUE_SIZE once full.
+client.max_inflight_messages_set(64)
+client.max_queued_messages_set(1000)
 client.connect(HOST, PORT, 60)
-client.subscribe("ctrl/+/set", qos=1)
-client.subscribe("ctrl/discover/start", qos=1)
-client.subscribe("discover/approved", qos=1)
-client.subscribe("discover/removed", qos=1)
+client.subscribe(
+    [("ctrl/+/set", 1), ("ctrl/discover/start", 1), ("discover/approved", 1), ("discover/removed", 1)]
+)
+client.loop_start()
 sync_pollers()
-client.loop_forever()
+if TELEMETRY_BATCH:
+    threading.Thread(target=telemetry_publisher, name="edge-telemetry", daemon=True).start()
+watch_registry()
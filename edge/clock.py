@@ -0,0 +1,15 @@
+import time
+
+# (epoch second, formatted string); swapped as one tuple so readers on other threads never see a torn pair
+_SECOND_CACHE: tuple[int, str] = (-1, "")
+
+
+def now_ts() -> str:
+    # "YYYY-MM-DDTHH:MM:SSZ" for the current second, formatted at most once per second
+    global _SECOND_CACHE
+    second = int(time.time())
+    cached = _SECOND_CACHE
+    if cached[0] != second:
+        cached = (second, time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(second)))
+        _SECOND_CACHE = cached
+    return cached[1]
@@ -1,14 +1,28 @@
+import atexit
+import errno
 import ipaddress
-import json
+import math
 import os
+import selectors
 import socket
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Set, Tuple
 
+import orjson
 import yaml
 from pymodbus.client import ModbusTcpClient
+
+from .clock import now_ts
+
+try:
+    from yaml import CSafeLoader as YamlLoader
+except ImportError:  # pragma: no cover - PyYAML built without libyaml
+    from yaml import SafeLoader as YamlLoader
+
 try:
     from pysnmp.hlapi import (
         CommunityData,
@@ -30,6 +44,56 @@ PORTS = {
     "bacnet": 47808,
     "mqtt": 1883,
 }
+TCP_PROBE_TIMEOUT_S = 0.8
+UDP_PROBE_TIMEOUT_S = 0.5
+BACNET_WHO_IS = bytes.fromhex("810b000c0120ffffffff")  # minimal BACnet BVLC Who-Is
+# worst case for one host: TCP sweep plus Modbus and SNMP fingerprint timeouts
+HOST_PROBE_BUDGET_S = TCP_PROBE_TIMEOUT_S + 2.0
+# how long to collect I-Am replies after the one broadcast Who-Is
+WHOIS_WINDOW_S = 1.5
+
+
+def _is_i_am(data: bytes) -> bool:
+    # BVLC (4 bytes) + NPDU header, then an unconfirmed-request APDU with service I-Am (0x00)
+    if len(data) < 8 or data[0] != 0x81:
+        return False
+    idx = 10 if data[1] == 0x04 else 4  # Forwarded-NPDU carries the original source B/IP address
+    if len(data) < idx + 2:
+        return False
+    control = data[idx + 1]
+    idx += 2
+    if control & 0x20:  # DNET, DLEN, DADR
+        if len(data) < idx + 3:
+            return False
+        idx += 3 + data[idx + 2]
+    if control & 0x08:  # SNET, SLEN, SADR
+        if len(data) < idx + 3:
+            return False
+        idx += 3 + data[idx + 2]
+    if control & 0x20:  # hop count
+        idx += 1
+    return data[idx : idx + 2] == b"\x10\x00"
+
+
+class TokenBucket:
+    # blocking token bucket: acquire() returns once a token is available, refilled at `rate`/s
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._cond = threading.Condition()
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                self._cond.wait((1 - self._tokens) / self.rate)
 
 
 @dataclass
@@ -42,36 +106,40 @@ class TemplateRegistry:
     def __init__(self, template_dir: str) -> None:
         self.template_dir = Path(template_dir)
         self.templates: List[Dict[str, str]] = []
+        # proto -> [(template, lowered vendor match or None, contains)] in load order
+        self._by_proto: Dict[str, List[Tuple[Dict[str, str], Optional[str], bool]]] = {}
         self.reload()
 
     def reload(self) -> None:
         self.templates = []
+        self._by_proto = {}
         if not self.template_dir.exists():
             return
         for file in self.template_dir.glob("*.yaml"):
             with file.open("r", encoding="utf-8") as handle:
-                data = yaml.safe_load(handle) or {}
+                data = yaml.load(handle, Loader=YamlLoader) or {}
                 if data:
                     self.templates.append(data)
-
-    def match(self, fingerprint: Fingerprint) -> Dict[str, str]:
         for template in self.templates:
-            if template.get("proto") != fingerprint.proto:
-                continue
             match = template.get("match", {})
             vendor_match = match.get("vendor")
-            contains = match.get("contains", False)
-            vendor = fingerprint.info.get("vendor", "")
-            if not vendor_match:
-                return template
-            if contains and vendor_match.lower() in vendor.lower():
-                return template
-            if not contains and vendor.lower() == vendor_match.lower():
-                return template
-        # fallback template per proto
-        for template in self.templates:
-            if template.get("proto") == fingerprint.proto:
-                return template
+            self._by_proto.setdefault(template.get("proto"), []).append(
+                (template, vendor_match.lower() if vendor_match else None, match.get("contains", False))
+            )
+
+    def match(self, fingerprint: Fingerprint) -> Dict[str, str]:
+        candidates = self._by_proto.get(fingerprint.proto)
+        if candidates:
+            vendor = fingerprint.info.get("vendor", "").lower()
+            for template, vendor_match, contains in candidates:
+                if vendor_match is None:
+                    return template
+                if contains and vendor_match in vendor:
+                    return template
+                if not contains and vendor == vendor_match:
+                    return template
+            # fallback template per proto
+            return candidates[0][0]
         return {
             "template": "generic_" + fingerprint.proto,
             "proto": fingerprint.proto,
@@ -84,27 +152,39 @@ class TemplateRegistry:
 class DiscoveryService:
     def __init__(self) -> None:
         self.rate_limit = float(os.environ.get("DISCOVERY_IPS_PER_MIN", "50"))
-        self.delay = 60.0 / self.rate_limit if self.rate_limit > 0 else 0
+        # DISCOVERY_IPS_PER_MIN stays the ceiling; a small burst lets idle workers start together
+        self._bucket = (
+            TokenBucket(self.rate_limit / 60.0, max(1.0, self.rate_limit // 10)) if self.rate_limit > 0 else None
+        )
+        self.workers = max(1, int(os.environ.get("DISCOVERY_WORKERS", "32")))
         self.snmp_community = os.environ.get("DISCOVERY_SNMP_COMMUNITY", "public")
         template_dir = os.environ.get("DISCOVERY_TEMPLATE_DIR", "./config/templates")
         self.templates = TemplateRegistry(template_dir)
         self.log_path = Path(os.environ.get("DISCOVERY_LOG_PATH", "./data/discovery.log"))
+        # one SnmpEngine per scan worker thread: expensive to build, not safe to share
+        self._snmp_local = threading.local()
         self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        # opened on the first scan and kept open; unbuffered O_APPEND, so each entry is one write()
+        self._log_fp = None
+        self._log_lock = threading.Lock()
 
     def scan(self, subnet: str) -> Dict[str, Any]:
         network = ipaddress.ip_network(subnet, strict=False)
         raw: List[Dict[str, any]] = []
         devices: List[Dict[str, any]] = []
         start = time.time()
-        for ip in network.hosts():
-            ip_str = str(ip)
-            services = self._probe_services(ip_str)
+        bacnet_hosts = self._broadcast_whois(network)
+        hosts = [str(ip) for ip in network.hosts()]
+        # workers take a token per host, so probe timeouts overlap on the pool while the host
+        # start rate stays under DISCOVERY_IPS_PER_MIN
+        with ThreadPoolExecutor(max_workers=self._pool_size(len(hosts)), thread_name_prefix="discover") as pool:
+            futures = [pool.submit(self._probe_host, ip, bacnet_hosts) for ip in hosts]
+            results = [future.result() for future in futures]
+        # submission order is host order, so results come back sorted by IP
+        for ip_str, services, fingerprint in results:
             if not services:
-                if self.delay:
-                    time.sleep(self.delay)
                 continue
             raw.append({"ip": ip_str, "services": services})
-            fingerprint = self._fingerprint(ip_str, services)
             if fingerprint:
                 template = self.templates.match(fingerprint)
                 devices.append(
@@ -118,44 +198,132 @@ class DiscoveryService:
                         "write": template.get("write", False),
                     }
                 )
-            if self.delay:
-                time.sleep(self.delay)
         duration = time.time() - start
         self._log_run(subnet, raw, devices, duration)
         return {"raw": raw, "devices": devices, "duration": duration}
 
-    def _probe_services(self, ip: str) -> Dict[str, bool]:
-        services = {}
-        for proto, port in PORTS.items():
-            if proto == "bacnet":
-                ok = self._probe_udp(ip, port)
-            else:
-                ok = self._probe_tcp(ip, port)
-            if ok:
-                services[proto] = True
-        return services
+    def _pool_size(self, host_count: int) -> int:
+        # the executor starts a thread per queued host up to max_workers; past the burst plus what
+        # the token rate lets finish within one probe budget, extra threads only wait on the bucket
+        size = self.workers
+        if self._bucket is not None:
+            size = min(size, int(self._bucket.capacity + math.ceil(self._bucket.rate * HOST_PROBE_BUDGET_S)))
+        return max(1, min(size, host_count))
+
+    def _probe_host(
+        self, ip: str, bacnet_hosts: Optional[Set[str]]
+    ) -> Tuple[str, Dict[str, bool], Optional[Fingerprint]]:
+        if self._bucket is not None:
+            self._bucket.acquire()
+        services = self._probe_services(ip, bacnet_hosts)
+        return ip, services, self._fingerprint(ip, services) if services else None
 
     @staticmethod
-    def _probe_tcp(ip: str, port: int) -> bool:
+    def _is_attached(network: ipaddress.IPv4Network) -> bool:
+        # routers drop directed broadcasts to subnets they forward to; the network is only
+        # broadcast-reachable when the route to it leaves from an address inside it
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         try:
-            with socket.create_connection((ip, port), timeout=0.8):
-                return True
+            sock.connect((str(network.network_address), PORTS["bacnet"]))
+            return ipaddress.ip_address(sock.getsockname()[0]) in network
         except OSError:
             return False
+        finally:
+            sock.close()
 
-    @staticmethod
-    def _probe_udp(ip: str, port: int) -> bool:
+    @classmethod
+    def _broadcast_whois(cls, network: ipaddress.IPv4Network) -> Optional[Set[str]]:
+        # Who-Is is meant to be broadcast: one datagram, then every device on the segment answers
+        # with I-Am. None when the subnet is not attached, the broadcast cannot be sent or nothing
+        # answered, so hosts fall back to unicast probes.
+        if not cls._is_attached(network):
+            return None
+        hosts: Set[str] = set()
         sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         try:
-            sock.settimeout(0.5)
-            who_is = bytes.fromhex("810b000c0120ffffffff")  # minimal BACnet BVLC Who-Is
-            sock.sendto(who_is, (ip, port))
-            sock.recvfrom(1024)
-            return True
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_BROADCAST, 1)
+            sock.sendto(BACNET_WHO_IS, (str(network.broadcast_address), PORTS["bacnet"]))
+            deadline = time.monotonic() + WHOIS_WINDOW_S
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                sock.settimeout(remaining)
+                try:
+                    data, (addr, _port) = sock.recvfrom(1024)
+                except socket.timeout:
+                    break
+                # _is_i_am checks the BVLC type and length before the forwarded source is read
+                if not _is_i_am(data):
+                    continue
+                if data[1] == 0x04:  # forwarded by a BBMD: the device is the original source
+                    addr = socket.inet_ntoa(data[4:8])
+                if ipaddress.ip_address(addr) in network:
+                    hosts.add(addr)
         except OSError:
-            return False
+            return None
         finally:
             sock.close()
+        return hosts or None
+
+    def _probe_services(self, ip: str, bacnet_hosts: Optional[Set[str]] = None) -> Dict[str, bool]:
+        # every port probed at once: non-blocking TCP connects (plus a unicast Who-Is only when
+        # the broadcast sweep was not possible), all waited on in one selector window
+        services: Dict[str, bool] = {}
+        if bacnet_hosts is not None and ip in bacnet_hosts:
+            services["bacnet"] = True
+        selector = selectors.DefaultSelector()
+        socks: List[socket.socket] = []
+        try:
+            for proto, port in PORTS.items():
+                try:
+                    if proto == "bacnet":
+                        if bacnet_hosts is not None:
+                            continue
+                        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                        socks.append(sock)
+                        sock.setblocking(False)
+                        sock.sendto(BACNET_WHO_IS, (ip, port))
+                        selector.register(sock, selectors.EVENT_READ, (proto, UDP_PROBE_TIMEOUT_S))
+                    else:
+                        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                        socks.append(sock)
+                        sock.setblocking(False)
+                        err = sock.connect_ex((ip, port))
+                        if err == 0:
+                            services[proto] = True
+                        elif err in (errno.EINPROGRESS, errno.EWOULDBLOCK):
+                            selector.register(sock, selectors.EVENT_WRITE, (proto, TCP_PROBE_TIMEOUT_S))
+                except OSError:
+                    continue
+            start = time.monotonic()
+            while selector.get_map():
+                elapsed = time.monotonic() - start
+                # drop probes whose own timeout has passed (UDP gives up sooner than TCP)
+                for key in list(selector.get_map().values()):
+                    if elapsed >= key.data[1]:
+                        selector.unregister(key.fileobj)
+                remaining = [key.data[1] - elapsed for key in selector.get_map().values()]
+                if not remaining:
+                    break
+                for key, _events in selector.select(timeout=min(remaining)):
+                    proto = key.data[0]
+                    sock = key.fileobj
+                    selector.unregister(sock)
+                    try:
+                        if proto == "bacnet":
+                            sock.recvfrom(1024)
+                            services[proto] = True
+                        elif sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                            services[proto] = True
+                    except OSError:
+                        continue
+        finally:
+            selector.close()
+            for sock in socks:
+                sock.close()
+        # keep the PORTS order the fingerprinting and raw results have always used
+        return {proto: True for proto in PORTS if proto in services}
 
     def _fingerprint(self, ip: str, services: Dict[str, bool]) -> Optional[Fingerprint]:
         if services.get("modbus"):
@@ -194,11 +362,14 @@ class DiscoveryService:
     def _fingerprint_snmp(self, ip: str) -> Optional[Dict[str, str]]:
         if not HAS_SNMP:
             return None
+        engine = getattr(self._snmp_local, "engine", None)
+        if engine is None:
+            engine = self._snmp_local.engine = (SnmpEngine(), ContextData())
         iterator = getCmd(
-            SnmpEngine(),
+            engine[0],
             CommunityData(self.snmp_community, mpModel=0),
             UdpTransportTarget((ip, PORTS["snmp"]), timeout=1, retries=0),
-            ContextData(),
+            engine[1],
             ObjectType(ObjectIdentity("SNMPv2-MIB", "sysObjectID", 0)),
         )
         try:
@@ -212,11 +383,15 @@ class DiscoveryService:
 
     def _log_run(self, subnet: str, raw: List[Dict[str, Any]], devices: List[Dict[str, Any]], duration: float) -> None:
         log_entry = {
-            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "ts": now_ts(),
             "subnet": subnet,
             "raw_count": len(raw),
             "device_count": len(devices),
             "duration_s": round(duration, 2),
         }
-        with self.log_path.open("a", encoding="utf-8") as handle:
-            handle.write(json.dumps(log_entry) + "\n")
+        line = orjson.dumps(log_entry, option=orjson.OPT_APPEND_NEWLINE)
+        with self._log_lock:
+            if self._log_fp is None:
+                self._log_fp = self.log_path.open("ab", buffering=0)
+                atexit.register(self._log_fp.close)
+            self._log_fp.write(line)
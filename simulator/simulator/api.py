@@ -1,6 +1,8 @@
-import json
 import os
-from http.server import BaseHTTPRequestHandler, HTTPServer
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import orjson
 
 CONTROL_PATH = os.environ.get("SIM_CONTROL_PATH", "/simulator/control.json")
 SCENARIOS = ["temp_spike", "cooling_failure", "sensor_dropout", "power_spike"]
@@ -26,9 +28,61 @@ def _device_list() -> list[dict]:
     return devices
 
 
+# the device list only depends on the environment, so its response is encoded once
+_DEVICES_BODY = orjson.dumps({"devices": _device_list()})
+_EMPTY_SCENARIOS_BODY = orjson.dumps({"scenarios": {}})
+
+# ((mtime_ns, size), encoded GET /scenarios response); reused until the file changes
+_ctrl_cache: tuple[tuple[int, int], bytes] | None = None
+# the file is rewritten in place (it is bind-mounted as a single file, so it cannot be renamed
+# over); GETs and POSTs in this process take the lock so they never see it half-written
+_ctrl_lock = threading.Lock()
+
+
+def _scenarios_body() -> bytes:
+    global _ctrl_cache
+    with _ctrl_lock:
+        try:
+            st = os.stat(CONTROL_PATH)
+        except FileNotFoundError:
+            return _EMPTY_SCENARIOS_BODY
+        version = (st.st_mtime_ns, st.st_size)
+        cached = _ctrl_cache
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        with open(CONTROL_PATH, "rb") as handle:
+            body = orjson.dumps({"scenarios": orjson.loads(handle.read())})
+        _ctrl_cache = (version, body)
+        return body
+
+
+def _write_control(data: dict) -> None:
+    global _ctrl_cache
+    payload = orjson.dumps(data)
+    with _ctrl_lock:
+        try:
+            before = os.stat(CONTROL_PATH)
+        except FileNotFoundError:
+            before = None
+        with open(CONTROL_PATH, "wb") as handle:
+            handle.write(payload)
+        st = os.stat(CONTROL_PATH)
+        if before is not None and (st.st_mtime_ns, st.st_size) == (before.st_mtime_ns, before.st_size):
+            # same size within one coarse mtime tick: move the mtime on so pollers see a new version
+            os.utime(CONTROL_PATH, ns=(st.st_atime_ns, before.st_mtime_ns + 1))
+            st = os.stat(CONTROL_PATH)
+        _ctrl_cache = ((st.st_mtime_ns, st.st_size), orjson.dumps({"scenarios": data}))
+
+
 class ScenarioHandler(BaseHTTPRequestHandler):
+    # keep-alive: dashboards polling on a schedule reuse one connection (and one server thread)
+    # instead of a TCP handshake and a new thread per request
+    protocol_version = "HTTP/1.1"
+
     def _json(self, data, status=200):
-        payload = json.dumps(data).encode("utf-8")
+        self._send(orjson.dumps(data), status)
+
+    def _send(self, payload: bytes, status=200):
         self.send_response(status)
         self.send_header("Content-Type", "application/json")
         self.send_header("Content-Length", str(len(payload)))
@@ -37,15 +91,10 @@ class ScenarioHandler(BaseHTTPRequestHandler):
 
     def do_GET(self):
         if self.path == "/scenarios":
-            try:
-                with open(CONTROL_PATH, "r", encoding="utf-8") as handle:
-                    current = json.load(handle)
-            except FileNotFoundError:
-                current = {}
-            self._json({"scenarios": current})
+            self._send(_scenarios_body())
             return
         if self.path == "/devices":
-            self._json({"devices": _device_list()})
+            self._send(_DEVICES_BODY)
             return
         self.send_error(404)
 
@@ -56,18 +105,17 @@ class ScenarioHandler(BaseHTTPRequestHandler):
         content_length = int(self.headers.get("Content-Length", 0))
         body = self.rfile.read(content_length)
         try:
-            data = json.loads(body.decode("utf-8"))
-        except json.JSONDecodeError:
+            data = orjson.loads(body)
+        except orjson.JSONDecodeError:
             self.send_error(400, "Invalid JSON")
             return
         filtered = {name: bool(val) for name, val in data.items() if name in SCENARIOS}
-        with open(CONTROL_PATH, "w", encoding="utf-8") as handle:
-            json.dump(filtered, handle)
+        _write_control(filtered)
         self._json({"status": "updated", "scenarios": filtered})
 
 
 def start_http():
     host = os.environ.get("SIM_API_HOST", "0.0.0.0")
     port = int(os.environ.get("SIM_API_PORT", "9100"))
-    httpd = HTTPServer((host, port), ScenarioHandler)
+    httpd = ThreadingHTTPServer((host, port), ScenarioHandler)
     httpd.serve_forever()
@@ -1,13 +1,11 @@
-import json
 import os
-import random
 import threading
 import time
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Dict, List, Optional, Tuple
 
 import numpy as np
-import paho.mqtt.publish as publish
+import orjson
 from paho.mqtt import client as mqtt
 
 from .api import start_http
@@ -19,6 +17,12 @@ MQTT_PASS = os.environ.get("SIM_MQTT_PASS", "")
 SITE = os.environ.get("SIM_SITE", "sim_dc")
 RACKS = [r.strip() for r in os.environ.get("SIM_RACKS", "R1,R2,R3,R4").split(",") if r.strip()]
 INTERVAL = float(os.environ.get("SIM_INTERVAL", "2"))
+# readings are replaced every tick, so a lost one is not worth a PUBACK round trip; receipts stay QoS 1
+TELEMETRY_QOS = int(os.environ.get("SIM_TELEMETRY_QOS", "0"))
+# one site/<site>/telemetry/batch message per tick instead of one message per rack (same
+# {"site", "racks"} shape the edge bridge's TELEMETRY_BATCH mode sends)
+TELEMETRY_BATCH = os.environ.get("SIM_TELEMETRY_BATCH", "false").lower() in ("1", "true", "yes")
+BATCH_TOPIC = f"site/{SITE}/telemetry/batch"
 CONTROL_PATH = Path(os.environ.get("SIM_CONTROL_PATH", "/simulator/control.json"))
 
 SCENARIOS = {
@@ -27,10 +31,11 @@ SCENARIOS = {
     "sensor_dropout": "Sensor dropout",
     "power_spike": "Power/UPS spike",
 }
-
-PUBLISH_ARGS: Dict[str, object] = {"hostname": MQTT_HOST, "port": MQTT_PORT}
-if MQTT_USER:
-    PUBLISH_ARGS["auth"] = {"username": MQTT_USER, "password": MQTT_PASS}
+# active scenarios are kept as bits of one int
+SCENARIO_BIT = {name: 1 << index for index, name in enumerate(SCENARIOS)}
+TEMP_SPIKE, COOLING_FAILURE, SENSOR_DROPOUT, POWER_SPIKE = (
+    SCENARIO_BIT[name] for name in ("temp_spike", "cooling_failure", "sensor_dropout", "power_spike")
+)
 
 
 def base_state() -> Dict[str, float]:
@@ -44,136 +49,209 @@ def base_state() -> Dict[str, float]:
     }
 
 
+# column order of the state array, one row per rack in RACKS order
+METRICS = tuple(base_state())
+COL = {name: index for index, name in enumerate(METRICS)}
+BASELINE = np.array([base_state()[name] for name in METRICS])
+TEMP, HUM, POWER, AIRFLOW, FAN, UPS = (
+    COL[name] for name in ("temp_c", "hum_pct", "power_kw", "airflow_cfm", "fan_rpm", "ups_load_pct")
+)
+# uniform ranges of the scenario kicks, one column each: temp_spike temp/fan,
+# cooling_failure temp/airflow loss, power_spike power/UPS load
+KICK_LOW = np.array([0.5, 30.0, 2.0, 10.0, 0.5, 5.0])
+KICK_SPAN = np.array([1.0, 30.0, 2.0, 10.0, 0.5, 5.0])
+NOISE = 0.1
+
+
 class DataCenterSimulator:
     def __init__(self) -> None:
-        self.state: Dict[str, Dict[str, float]] = {rack: base_state().copy() for rack in RACKS}
-        self.active: Dict[str, bool] = {name: False for name in SCENARIOS}
+        # every rack's metrics in one (racks, metrics) array so a tick updates them all at once
+        self.state = np.tile(BASELINE, (len(RACKS), 1))
+        self.rows: Dict[str, int] = {rack: index for index, rack in enumerate(RACKS)}
+        self._rng = np.random.default_rng()
+        # tick() reads the int once per tick without locking; writers serialize the read-modify-write
+        self.flags = 0
+        self._flags_lock = threading.Lock()
         self.control_targets: Dict[str, Dict[str, float]] = {}
+        # per-rack constants of every reading, built once instead of formatted per publish
+        self.topics: Dict[str, str] = {rack: f"site/{SITE}/rack/{rack}/telemetry" for rack in RACKS}
+        self.device_ids: Dict[str, str] = {rack: f"sim_{rack.lower()}" for rack in RACKS}
+        # inbound commands are addressed by device id; first rack wins, as the old scan did
+        self.rack_by_device: Dict[str, str] = {}
+        for rack, device_id in self.device_ids.items():
+            self.rack_by_device.setdefault(device_id, rack)
+        # the fixed "site"/"rack"/"device_id" members of each reading, already JSON-encoded
+        self.headers: Dict[str, bytes] = {
+            rack: orjson.dumps({"site": SITE, "rack": rack, "device_id": self.device_ids[rack]})[1:-1]
+            for rack in RACKS
+        }
+        # one long-lived session for telemetry, control commands and receipts instead of a
+        # TCP + CONNECT handshake per published reading
+        self.client = mqtt.Client()
+        if MQTT_USER:
+            self.client.username_pw_set(MQTT_USER, MQTT_PASS)
+        # a tick's readings go out back to back; leave room for all of them (and a few ticks of
+        # slow PUBACKs) to be in flight at once
+        self.client.max_inflight_messages_set(max(20, len(RACKS) * 4))
+
+    def connect(self) -> None:
+        # the background loop reconnects on its own after a broker restart
+        self.client.reconnect_delay_set(min_delay=1, max_delay=30)
+        self.client.connect(MQTT_HOST, MQTT_PORT, 60)
+        self.client.loop_start()
 
     def set_scenario(self, name: str, enabled: bool) -> None:
-        if name in self.active:
-            self.active[name] = enabled
+        bit = SCENARIO_BIT.get(name)
+        if bit is None:
+            return
+        with self._flags_lock:
+            if enabled:
+                self.flags |= bit
+            else:
+                self.flags &= ~bit
 
     def device_id(self, rack: str) -> str:
-        return f"sim_{rack.lower()}"
+        return self.device_ids.get(rack) or f"sim_{rack.lower()}"
 
     def rack_from_device(self, device_id: str) -> Optional[str]:
-        for rack in RACKS:
-            if self.device_id(rack) == device_id:
-                return rack
-        return None
+        return self.rack_by_device.get(device_id)
 
     def apply_control(self, rack: str, setpoints: Dict[str, float]) -> Dict[str, float]:
-        if rack not in self.state:
+        if rack not in self.rows:
             return {}
-        state = self.state[rack]
+        state = self.state[self.rows[rack]]
         applied: Dict[str, float] = {}
         if "fan_rpm" in setpoints:
-            state["fan_rpm"] = float(setpoints["fan_rpm"])
-            applied["fan_rpm"] = state["fan_rpm"]
+            state[FAN] = float(setpoints["fan_rpm"])
+            applied["fan_rpm"] = float(state[FAN])
         if "supply_temp_c" in setpoints:
             target = float(setpoints["supply_temp_c"])
-            state["temp_c"] -= min(3.0, (state["temp_c"] - target) * 0.6)
+            state[TEMP] -= min(3.0, (state[TEMP] - target) * 0.6)
             applied["supply_temp_c"] = target
         self.control_targets[rack] = applied
         return applied
 
-    def _apply(self, rack: str) -> None:
-        state = self.state[rack]
-        if self.active.get("temp_spike"):
-            state["temp_c"] += random.uniform(0.5, 1.5)
-            state["fan_rpm"] += random.uniform(30, 60)
-        if self.active.get("cooling_failure") and rack in RACKS[:2]:
-            state["temp_c"] += random.uniform(2.0, 4.0)
-            state["airflow_cfm"] -= random.uniform(10, 20)
-        if self.active.get("sensor_dropout") and rack == RACKS[-1]:
-            state["temp_c"] = np.nan
-            state["hum_pct"] = np.nan
-        if self.active.get("power_spike"):
-            state["power_kw"] += random.uniform(0.5, 1.0)
-            state["ups_load_pct"] += random.uniform(5, 10)
-
-    def _decay(self, rack: str) -> None:
-        baseline = base_state()
-        state = self.state[rack]
-        for key, target in baseline.items():
-            if np.isnan(state[key]):
-                continue
-            state[key] += (target - state[key]) * 0.05
-            state[key] += random.uniform(-0.1, 0.1)
+    def _apply(self, kicks: np.ndarray) -> None:
+        state = self.state
+        flags = self.flags
+        if flags & TEMP_SPIKE:
+            state[:, TEMP] += kicks[:, 0]
+            state[:, FAN] += kicks[:, 1]
+        if flags & COOLING_FAILURE:
+            # the first two racks share the failed zone
+            zone = state[:2]
+            zone[:, TEMP] += kicks[: len(zone), 2]
+            zone[:, AIRFLOW] -= kicks[: len(zone), 3]
+        if flags & SENSOR_DROPOUT and len(state):
+            state[-1, [TEMP, HUM]] = np.nan
+        if flags & POWER_SPIKE:
+            state[:, POWER] += kicks[:, 4]
+            state[:, UPS] += kicks[:, 5]
+
+    def _decay(self, noise: np.ndarray) -> None:
+        # dropped-out sensors stay NaN: NaN arithmetic keeps them that way
+        self.state += (BASELINE - self.state) * 0.05 + noise
 
     def tick(self) -> None:
-        for rack in RACKS:
-            self._apply(rack)
-            self._decay(rack)
-            self._publish(rack)
-
-    def _publish(self, rack: str) -> None:
-        payload = {
-            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-            "site": SITE,
-            "rack": rack,
-            "device_id": self.device_id(rack),
-            "metrics": {k: (None if np.isnan(v) else round(v, 2)) for k, v in self.state[rack].items()},
-        }
-        publish.single(
-            f"site/{SITE}/rack/{rack}/telemetry",
-            json.dumps(payload),
-            qos=1,
-            **PUBLISH_ARGS,
-        )
+        # step every rack first, then hand all readings to the client in one burst so their
+        # PUBLISH packets and PUBACKs pipeline instead of interleaving with the model updates
+        # every random number of the tick in one draw: scenario kicks, then per-metric noise
+        draws = self._rng.random((len(RACKS), len(KICK_LOW) + len(METRICS)))
+        self._apply(KICK_LOW + KICK_SPAN * draws[:, : len(KICK_LOW)])
+        self._decay(NOISE * (2.0 * draws[:, len(KICK_LOW) :] - 1.0))
+        head = b'{"ts":' + orjson.dumps(time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())) + b","
+        # rounded for the whole array at once; orjson writes the NaN of a dropped-out sensor as null
+        rows = np.round(self.state, 2).tolist()
+        messages = [self._reading(rack, head, values) for rack, values in zip(RACKS, rows)]
+        if TELEMETRY_BATCH and len(messages) > 1:
+            racks = b",".join(payload for _topic, payload in messages)
+            batch = b'{"site":' + orjson.dumps(SITE) + b',"racks":[' + racks + b"]}"
+            self.client.publish(BATCH_TOPIC, batch, qos=TELEMETRY_QOS)
+            return
+        for topic, payload in messages:
+            self.client.publish(topic, payload, qos=TELEMETRY_QOS)
+
+    def _reading(self, rack: str, head: bytes, values: List[float]) -> Tuple[str, bytes]:
+        # only the metrics object goes through the encoder; the rest is spliced in as bytes
+        metrics = orjson.dumps(dict(zip(METRICS, values)))
+        return self.topics[rack], b"".join((head, self.headers[rack], b',"metrics":', metrics, b"}"))
 
 
 SIM = DataCenterSimulator()
 
 
 def control_poll_loop() -> None:
+    # the API rewrites the file in place and always moves (mtime_ns, size) on when it does, so an
+    # unchanged pair means unchanged scenarios and the read + parse can be skipped
+    version = None
     while True:
-        if CONTROL_PATH.exists():
+        try:
+            st = CONTROL_PATH.stat()
+        except FileNotFoundError:
+            st = None
+        if st is not None and (st.st_mtime_ns, st.st_size) != version:
             try:
-                data = json.loads(CONTROL_PATH.read_text())
-            except json.JSONDecodeError:
-                data = {}
-            for name, val in data.items():
-                SIM.set_scenario(name, bool(val))
+                data = orjson.loads(CONTROL_PATH.read_bytes())
+            except orjson.JSONDecodeError:
+                # caught mid-rewrite: leave the version unset and read it again next second
+                data = None
+            if data is not None:
+                version = (st.st_mtime_ns, st.st_size)
+                for name, val in data.items():
+                    SIM.set_scenario(name, bool(val))
         time.sleep(1)
 
 
 def main_loop() -> None:
+    # fixed cadence on a start + k * INTERVAL grid: the tick's own work comes out of the interval
+    # instead of adding to it, and rounding never accumulates into drift
+    start = time.monotonic()
+    k = 0
     while True:
         SIM.tick()
-        time.sleep(INTERVAL)
+        k += 1
+        delay = start + k * INTERVAL - time.monotonic()
+        if delay < 0:
+            # fell behind (e.g. the process was suspended): skip the missed slots, no catch-up burst
+            k = int((time.monotonic() - start) / INTERVAL) + 1
+            delay = start + k * INTERVAL - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
 
 
 def start_control_listener() -> None:
-    client = mqtt.Client()
-    if MQTT_USER:
-        client.username_pw_set(MQTT_USER, MQTT_PASS)
+    client = SIM.client
 
     def on_control(_client, _userdata, msg) -> None:
         try:
-            payload = json.loads(msg.payload.decode())
-        except json.JSONDecodeError:
+            payload = orjson.loads(msg.payload)
+        except orjson.JSONDecodeError:
             return
-        device_id = payload.get("device_id")
-        rack = SIM.rack_from_device(device_id) if device_id else None
-        if not rack:
-            return
-        applied = SIM.apply_control(rack, payload.get("set", {}))
-        receipt = {
-            "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
-            "device_id": device_id,
-            "status": "applied",
-            "applied": applied,
-            "latency_ms": 50,
-            "notes": "simulator control",
-        }
-        client.publish(f"ctrl/{device_id}/receipt", json.dumps(receipt), qos=1)
+        # the API coalesces back-to-back commands for one device into {"batch": [...]}
+        for command in payload.get("batch", [payload]):
+            device_id = command.get("device_id")
+            rack = SIM.rack_from_device(device_id) if device_id else None
+            if not rack:
+                continue
+            applied = SIM.apply_control(rack, command.get("set", {}))
+            receipt = {
+                "ts": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "device_id": device_id,
+                "status": "applied",
+                "applied": applied,
+                "latency_ms": 50,
+                "notes": "simulator control",
+            }
+            client.publish(f"ctrl/{device_id}/receipt", orjson.dumps(receipt), qos=1)
+
+    def on_connect(_client, _userdata, _flags, rc) -> None:
+        # (re)subscribe per session so commands keep arriving after a reconnect
+        if rc == 0:
+            client.subscribe("ctrl/+/set", qos=1)
 
     client.on_message = on_control
-    client.connect(MQTT_HOST, MQTT_PORT, 60)
-    client.subscribe("ctrl/+/set", qos=1)
-    threading.Thread(target=client.loop_forever, daemon=True).start()
+    client.on_connect = on_connect
+    SIM.connect()
 
 
 def start() -> None: